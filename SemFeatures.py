@@ -1,7 +1,11 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8, vim: expandtab:ts=4 -*-
 
+import os
 import sys
+import time
+import pickle
+import hashlib
 import xml.sax
 from collections import defaultdict
 
@@ -33,7 +37,12 @@ class SemFeaturesParserContentHandler(xml.sax.ContentHandler):
         self.m_ppath = []                   # contains the XML path to the current node (names of the ancestors)
         self.m_currfeat = ""                # feature currently being processed
         self.m_wn = wn                      # WordNet (WNQuery)
-        self.m_featmap = defaultdict(list)  # semantic features to synset ids
+        self.m_featmap = defaultdict(set)   # semantic features to synset ids
+        self.m_dupcnt = 0                   # number of duplicate feature-synset id pairs skipped while parsing
+        self.m_loadstats = dict()           # timings and counts of the last load, see readXML() and readSnapshot()
+        self.m_closure = dict()             # pos -> {synset id -> {feature -> feature synset id}}, see featureClosure()
+        self.m_closuregen = wn.m_generation # generation of the WordNet the closures were computed for
+        self.m_invfeatmap = None            # feature synset ids to semantic features, see invFeatMap()
 
     def startElement(self, name, attrs):
         if DEBUG:
@@ -41,17 +50,20 @@ class SemFeaturesParserContentHandler(xml.sax.ContentHandler):
                                                         self._locator.getColumnNumber(),
                                                          "/".join(self.m_ppath),
                                                          name))
+            self.m_ppath.append(name)  # the path is only needed for debug output
 
-        self.m_ppath.append(name)
-
-        if name == "semfeature":
+        if name == "synset":
+            if "id" in attrs:
+                # save current attribute + synset pair (deduplicated)
+                ids = self.m_featmap[self.m_currfeat]
+                if attrs["id"] in ids:
+                    self.m_dupcnt += 1
+                else:
+                    ids.add(attrs["id"])
+        elif name == "semfeature":
             if "name" in attrs:
                 # save current attribute
                 self.m_currfeat = attrs["name"]
-        elif name == "synset":
-            if "id" in attrs:
-                # save current attribute + synset pair
-                self.m_featmap[self.m_currfeat].append(attrs["id"])
 
     def characters(self, chrs):
         if DEBUG:
@@ -66,19 +78,16 @@ class SemFeaturesParserContentHandler(xml.sax.ContentHandler):
                                                         self._locator.getColumnNumber(),
                                                          "/".join(self.m_ppath),
                                                          name))
-
-        self.m_ppath.pop()
+            self.m_ppath.pop()
 
     # Get synset ids mapped to a semantic feature.
     # @param feature name of semantic feature to look up
     # @param res result: synset ids pertaining to feature, or empty if feature was not found
     # @return true if feature was found, false otherwise
     def lookUpFeature(self, feature):
-        res = set()
         if feature in self.m_featmap:
-            for wnid in self.m_featmap[feature]:
-                res.add(wnid)
-        return res
+            return set(self.m_featmap[feature])
+        return set()
 
     # Check whether a literal with given POS is compatible with the given semantic feature.
     # Check if any sense of literal in WN is a (distant) hyponym of any of the synset ids corresponding to the semantic feature.
@@ -88,16 +97,138 @@ class SemFeaturesParserContentHandler(xml.sax.ContentHandler):
     # @param res_sense_ssid if compatibility was found, the id of the synset containing the sense of the literal that was compatible with the feature
     # @param res_feature_ssid if compatibility was found, the synset id of the interpretation of the feature that was found to be compatible with the literal
     # @return true if compatibility was found, false otherwise (no sense of literal was compatible with any of ids pertaining to feature, or literal or feature was not found)
+    # Uses the precomputed closure (see featureClosure()), so the check is a dict lookup per sense.
+    # If a sense is compatible via several synsets of the feature, any one of them may be returned.
     def isLiteralCompatibleWithFeature(self, literal, pos, feature):
-        feat_ids = self.lookUpFeature(feature)
-        if feat_ids:
-            return self.m_wn.isLiteralConnectedWith(literal, pos, "hypernym", feat_ids)
+        closure = self.featureClosure(pos)
+        for wnid in self.m_wn.lookUpLiteralS(literal, pos) or ():
+            feats = closure.get(wnid)
+            if feats and feature in feats:
+                return wnid, feats[feature]
         return None, None
 
+    # Get the precomputed feature closure for POS, building it on first use.
+    # The closure maps every synset that is the synset of a feature, or its (distant) hyponym
+    # along the inverse of the hypernym relation, to the features it is compatible with,
+    # and each of those to the feature synset id it descends from.
+    # @param pos part-of-speech (allowed values: n, v, a, b)
+    # @exception InvalidPOSException for invalid POS
+    def featureClosure(self, pos):
+        if self.m_closuregen != self.m_wn.m_generation:  # WordNet was updated since
+            self.m_closure = dict()
+            self.m_closuregen = self.m_wn.m_generation
+        if pos not in self.m_closure:
+            dat = self.m_wn.dat(pos)
+            # hypernym edges inverted: synset id -> ids of synsets having it as hypernym
+            children = defaultdict(list)
+            for wnid, syns in dat.items():
+                for target, rel in syns.ilrs:
+                    if rel == "hypernym":
+                        children[target].append(wnid)
+            closure = defaultdict(dict)
+            for feature, feat_ids in self.m_featmap.items():
+                for feat_id in sorted(feat_ids):
+                    # iterative DFS, cycle safe; the first feature synset reaching a node is its witness
+                    stack = [feat_id]
+                    while stack:
+                        wnid = stack.pop()
+                        feats = closure[wnid]
+                        if feature not in feats:
+                            feats[feature] = feat_id
+                            stack.extend(children.get(wnid, ()))
+            closure.default_factory = None
+            self.m_closure[pos] = closure
+        return self.m_closure[pos]
+
+    # Build the feature closures of all POS at once (eg. before serving queries).
+    def precomputeClosures(self):
+        for pos in ("n", "v", "a", "b"):
+            self.featureClosure(pos)
+
+    # Tag a whole token list with all compatible semantic features in one pass.
+    # @param tokens iterable of (literal, pos) pairs
+    # @return list with a sorted tuple of compatible feature names for each token (empty if none)
+    # @exception InvalidPOSException for invalid POS
+    def tagTokens(self, tokens):
+        res = []
+        cache = dict()
+        for token in tokens:
+            if token not in cache:
+                literal, pos = token
+                closure = self.featureClosure(pos)
+                feats = set()
+                for wnid in self.m_wn.lookUpLiteralS(literal, pos) or ():
+                    feats.update(closure.get(wnid, ()))
+                cache[token] = tuple(sorted(feats))
+            res.append(cache[token])
+        return res
+
+    # Get the inverted feature map (feature synset id -> set of features), building it on first use.
+    def invFeatMap(self):
+        if self.m_invfeatmap is None:
+            inv = defaultdict(set)
+            for feature, feat_ids in self.m_featmap.items():
+                for feat_id in feat_ids:
+                    inv[feat_id].add(feature)
+            inv.default_factory = None
+            self.m_invfeatmap = inv
+        return self.m_invfeatmap
+
+    # Get the feature synsets among the hypernym ancestors of a synset (including itself).
+    # The ancestry is walked exactly once (cycle safe) and intersected with the inverted feature map.
+    # @return list of (feature, feature synset id) pairs
+    def _featureHits(self, wnid, pos):
+        inv = self.invFeatMap()
+        hits = []
+        seen = {wnid}
+        stack = [wnid]
+        while stack:
+            curr = stack.pop()
+            for feature in inv.get(curr, ()):
+                hits.append((feature, curr))
+            for target in self.m_wn.lookUpRelation(curr, pos, "hypernym"):
+                if target not in seen:
+                    seen.add(target)
+                    stack.append(target)
+        return hits
+
+    # Find every semantic feature a literal is compatible with.
+    # @param literal the literal to check
+    # @param pos part-of-speech of literal (allowed values: n, v, a, b)
+    # @return dict: feature -> list of (sense synset id, feature synset id) witnesses (empty if no compatible feature)
+    # @exception InvalidPOSException for invalid POS
+    def classifyLiteral(self, literal, pos):
+        return self.classifyLiterals([literal], pos).get(literal, {})
+
+    # Batch version of classifyLiteral(): every distinct literal and sense is processed only once.
+    # @param literals iterable of literals
+    # @param pos part-of-speech of literals (allowed values: n, v, a, b)
+    # @return dict: literal -> result of classifyLiteral() for it
+    # @exception InvalidPOSException for invalid POS
+    def classifyLiterals(self, literals, pos):
+        self.m_wn.dat(pos)  # check POS
+        hits = dict()  # sense synset id -> hits
+        res = dict()
+        for literal in literals:
+            if literal in res:
+                continue
+            feats = defaultdict(list)
+            for wnid in self.m_wn.lookUpLiteralS(literal, pos) or ():
+                if wnid not in hits:
+                    hits[wnid] = self._featureHits(wnid, pos)
+                for feature, feat_id in hits[wnid]:
+                    feats[feature].append((wnid, feat_id))
+            res[literal] = dict(feats)
+        return res
+
     # Read mapping (semantic features to synset ids) from XML file.
+    # Duplicate feature-synset id pairs are dropped while parsing.
+    # Timings and counts of the load are available from loadStats() afterwards.
     # @param filename name of XML file
-    # @return number of feature name-synset id pairs read successfully
-    def readXML(self, semfeaturesfilename):
+    # @param validate if true, also check feature synset ids against the loaded WordNet (see validateFeatures())
+    # @return number of distinct feature name-synset id pairs read successfully
+    def readXML(self, semfeaturesfilename, validate=False):
+        t0 = time.perf_counter()
         # open file
         try:
             fh = open(semfeaturesfilename, "r", encoding="UTF-8")
@@ -112,13 +243,113 @@ class SemFeaturesParserContentHandler(xml.sax.ContentHandler):
         # Set ErrorHandler
         xmlReader.setErrorHandler(SemFeaturesParserErrorHandler())
         # Do the actual parsing
+        self.m_featmap.default_factory = set
+        self.m_dupcnt = 0
         xmlReader.parse(fh)
         fh.close()
         # Close defaultdict for safety
         self.m_featmap.default_factory = None
+        # features changed: closures and inverted map must be rebuilt
+        self.m_closure = dict()
+        self.m_invfeatmap = None
         # Return the gathered result
-        m_featmap_len = 0
-        for it in self.m_featmap.values():
-            m_featmap_len += len(it)
+        m_featmap_len = self.pairCount()
+        self.m_loadstats = {"source": semfeaturesfilename, "features": len(self.m_featmap), "pairs": m_featmap_len,
+                            "duplicates": self.m_dupcnt, "parse_time": time.perf_counter() - t0}
+        if validate:
+            self.validateFeatures()
         return m_featmap_len
 
+    # Number of distinct feature name-synset id pairs.
+    def pairCount(self):
+        return sum(len(ids) for ids in self.m_featmap.values())
+
+    # Check all feature synset ids against the loaded WordNet in one pass.
+    # An id is valid if it is present in the synsets of any POS.
+    # @return dict: feature -> sorted list of unknown synset ids (only features having unknown ids are included)
+    def validateFeatures(self):
+        t0 = time.perf_counter()
+        known = set()
+        for pos in ("n", "v", "a", "b"):
+            known.update(self.m_wn.dat(pos).keys())
+        res = dict()
+        for feature, feat_ids in self.m_featmap.items():
+            unknown = feat_ids - known
+            if unknown:
+                res[feature] = sorted(unknown)
+        self.m_loadstats["unknown_ids"] = sum(len(ids) for ids in res.values())
+        self.m_loadstats["validate_time"] = time.perf_counter() - t0
+        return res
+
+    # Get timings (seconds) and counts of the last load (readXML() or readSnapshot()).
+    def loadStats(self):
+        return dict(self.m_loadstats)
+
+    # Write timings and counts of the last load.
+    # @param os the output stream to write to
+    def writeLoadStats(self, os):
+        for key, val in sorted(self.m_loadstats.items()):
+            if isinstance(val, float):
+                print("{0}\t{1:.4f}".format(key, val), file=os)
+            else:
+                print("{0}\t{1}".format(key, val), file=os)
+
+    # Fingerprint of the WordNet the closures were computed for. For a WordNet loaded from a file and not updated
+    # since, the synset counts and the size and modification time of the source (all files of a directory) are
+    # enough, and cheap. Otherwise it is a hash of the synset ids and their hypernym edges (the closures depend on
+    # nothing else), so a WordNet with the same counts but different structure is told apart.
+    def _wnSignature(self):
+        wn = self.m_wn
+        source = wn.m_source
+        if source is not None and wn.m_generation == 0:
+            try:
+                if os.path.isdir(source):
+                    files = sorted(os.path.join(source, name) for name in os.listdir(source))
+                else:
+                    files = [source]
+                stats = [os.stat(name) for name in files]
+                return (tuple(len(wn.dat(pos)) for pos in ("n", "v", "a", "b")),
+                        tuple((st.st_size, st.st_mtime_ns) for st in stats))
+            except OSError:
+                pass  # source is gone, fall back to hashing
+        h = hashlib.sha1()
+        for pos in ("n", "v", "a", "b"):
+            h.update("\0{0}\0".format(pos).encode("UTF-8"))
+            for wnid, syns in sorted(self.m_wn.dat(pos).items()):
+                targets = sorted(target for target, rel in syns.ilrs if rel == "hypernym")
+                h.update("{0}\t{1}\n".format(wnid, "\t".join(targets)).encode("UTF-8"))
+        return h.hexdigest()
+
+    # Save features and all closures computed so far to a snapshot file for fast restart.
+    # @param filename name of snapshot file
+    def writeSnapshot(self, filename):
+        snapshot = {"featmap": dict(self.m_featmap), "closure": self.m_closure, "wn": self._wnSignature()}
+        try:
+            with open(filename, "wb") as fh:
+                pickle.dump(snapshot, fh, protocol=pickle.HIGHEST_PROTOCOL)
+        except (OSError, IOError) as e:
+            raise SemFeaturesParserException("Could not write file: {0} because: {1}".format(filename, e))
+
+    # Load features (and closures) from a snapshot file written by writeSnapshot().
+    # Closures are dropped (and rebuilt on demand) if the snapshot was made with a different WordNet.
+    # @param filename name of snapshot file
+    # @return number of distinct feature name-synset id pairs read successfully
+    def readSnapshot(self, filename):
+        t0 = time.perf_counter()
+        try:
+            with open(filename, "rb") as fh:
+                snapshot = pickle.load(fh)
+        except (OSError, IOError, pickle.UnpicklingError, EOFError) as e:
+            raise SemFeaturesParserException("Could not read snapshot: {0} because: {1}".format(filename, e))
+        self.m_featmap = defaultdict(set, snapshot["featmap"])
+        self.m_featmap.default_factory = None
+        self.m_invfeatmap = None
+        if snapshot["wn"] == self._wnSignature():
+            self.m_closure = snapshot["closure"]
+            self.m_closuregen = self.m_wn.m_generation
+        else:
+            self.m_closure = dict()
+        m_featmap_len = self.pairCount()
+        self.m_loadstats = {"source": filename, "features": len(self.m_featmap), "pairs": m_featmap_len,
+                            "closures": len(self.m_closure), "load_time": time.perf_counter() - t0}
+        return m_featmap_len
@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8, vim: expandtab:ts=4 -*-
+
+import os
+import gc
+import sys
+import csv
+import time
+import itertools
+from collections import Counter
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None  # pyarrow is not installed, only NumPy/CSV output is available
+
+try:
+    import numpy
+except ImportError:
+    numpy = None  # numpy is not installed, only Parquet/CSV output is available
+
+import synset
+import WNQuery
+
+# Columnar export of a WordNet (WNQuery) to a directory of tables, and import from it.
+#
+# Tables (one file per table, <name>.parquet, <name>.npz or <name>.csv):
+# ids       node, wnid, pos                                 every synset, and every missing relation target (pos is empty)
+# synsets   node, wnid3, definition, bcs, stamp, domain, nl, tnl
+# synonyms  node, literal, sense, lnote, nucleus
+# links     node, kind, target, type                        kind: usage, snote (type is empty), sumo, elr, elr3, eksz, vframe
+# edges     src, dst, rel, inv                              internal relations, integer coded (inv is 1 for inverted ones)
+# relations rel, name                                       relation codes used in edges
+# In .npz files integer columns are int64 arrays, string columns are stored without pickling as the UTF-8 bytes
+# of the concatenated values (<col>) and the character offsets of the values in it (<col>.offsets).
+_TABLES = {
+    "ids":       (("node", int), ("wnid", str), ("pos", str)),
+    "synsets":   (("node", int), ("wnid3", str), ("definition", str), ("bcs", str), ("stamp", str),
+                  ("domain", str), ("nl", str), ("tnl", str)),
+    "synonyms":  (("node", int), ("literal", str), ("sense", str), ("lnote", str), ("nucleus", str)),
+    "links":     (("node", int), ("kind", str), ("target", str), ("type", str)),
+    "edges":     (("src", int), ("dst", int), ("rel", int), ("inv", int)),
+    "relations": (("rel", int), ("name", str)),
+}
+
+# Synset list members holding (target, type) pairs, by link kind
+_PAIR_LINKS = (("sumo", "sumolinks"), ("elr", "elrs"), ("elr3", "elrs3"), ("eksz", "ekszlinks"), ("vframe", "vframelinks"))
+
+class WNExportException(Exception):
+    def __init__(self, message):
+        self.message = message
+    def __str__(self):
+        return repr(self.message)
+
+# Resolve output format: parquet if pyarrow is available, npz if numpy is available, csv otherwise
+def _format(fmt):
+    if fmt is None:
+        fmt = "parquet" if pyarrow is not None else "npz" if numpy is not None else "csv"
+    if fmt not in ("parquet", "npz", "csv"):
+        raise WNExportException("Invalid format '{0}'".format(fmt))
+    if fmt == "parquet" and pyarrow is None:
+        raise WNExportException("Format 'parquet' needs the pyarrow module")
+    if fmt == "npz" and numpy is None:
+        raise WNExportException("Format 'npz' needs the numpy module")
+    return fmt
+
+def _write_table(dirname, name, cols, fmt):
+    path = os.path.join(dirname, "{0}.{1}".format(name, fmt))
+    if fmt == "parquet":
+        pyarrow.parquet.write_table(pyarrow.table(cols), path)
+    elif fmt == "npz":
+        arrays = dict()
+        for col, typ in _TABLES[name]:
+            if typ is int:
+                arrays[col] = numpy.array(cols[col], dtype=numpy.int64)
+            else:
+                arrays[col] = numpy.frombuffer("".join(cols[col]).encode("UTF-8"), dtype=numpy.uint8)
+                arrays[col + ".offsets"] = numpy.array(list(itertools.accumulate(itertools.chain(
+                    (0,), map(len, cols[col])))), dtype=numpy.int64)
+        numpy.savez(path, **arrays)
+    else:
+        with open(path, "w", encoding="UTF-8", newline="") as fh:
+            writer = csv.writer(fh)
+            writer.writerow([col for col, _ in _TABLES[name]])
+            writer.writerows(zip(*(cols[col] for col, _ in _TABLES[name])))
+
+def _read_table(dirname, name, fmt):
+    path = os.path.join(dirname, "{0}.{1}".format(name, fmt))
+    if fmt == "parquet":
+        return pyarrow.parquet.read_table(path).to_pydict()
+    if fmt == "npz":
+        cols = dict()
+        with numpy.load(path, allow_pickle=False) as arrays:
+            for col, typ in _TABLES[name]:
+                if col not in arrays:
+                    raise WNExportException("Missing column in {0}: {1}".format(path, col))
+                if typ is int:
+                    cols[col] = arrays[col].tolist()
+                else:
+                    text = arrays[col].tobytes().decode("UTF-8")
+                    offsets = arrays[col + ".offsets"].tolist()
+                    cols[col] = [text[a:b] for a, b in zip(offsets, offsets[1:])]
+        return cols
+    with open(path, "r", encoding="UTF-8", newline="") as fh:
+        reader = csv.reader(fh)
+        header = next(reader)
+        if header != [col for col, _ in _TABLES[name]]:
+            raise WNExportException("Unexpected columns in {0}: {1}".format(path, header))
+        rows = list(reader)
+    cols = dict()
+    for i, (col, typ) in enumerate(_TABLES[name]):
+        if typ is int:
+            cols[col] = [int(row[i]) for row in rows]
+        else:
+            cols[col] = [row[i] for row in rows]
+    return cols
+
+# Export synsets, synonyms and relation edges of a WordNet as columnar tables.
+# @param wn the WNQuery object to export
+# @param dirname output directory (created if needed)
+# @param fmt parquet|npz|csv, the default is parquet if pyarrow is installed, npz if numpy is, csv otherwise
+# @return dict: table name -> number of rows written
+# @exception WNExportException for invalid or unavailable format
+def exportColumnar(wn, dirname, fmt=None):
+    fmt = _format(fmt)
+    os.makedirs(dirname, exist_ok=True)
+    tables = {name: {col: [] for col, _ in cols} for name, cols in _TABLES.items()}
+    ids, syns_t, syn_t, links, edges = (tables["ids"], tables["synsets"], tables["synonyms"],
+                                        tables["links"], tables["edges"])
+
+    # number synsets first, so relation targets can be resolved
+    nodes = dict()  # (wnid, pos) -> node
+    for pos in ("n", "v", "a", "b"):
+        for wnid in wn.dat(pos):
+            nodes[(wnid, pos)] = len(nodes)
+            ids["node"].append(len(ids["node"]))
+            ids["wnid"].append(wnid)
+            ids["pos"].append(pos)
+
+    rels = dict()  # relation name -> code
+    for pos in ("n", "v", "a", "b"):
+        for wnid, syns in wn.dat(pos).items():
+            node = nodes[(wnid, pos)]
+            syns_t["node"].append(node)
+            for col in ("wnid3", "definition", "bcs", "stamp", "domain", "nl", "tnl"):
+                syns_t[col].append(getattr(syns, col))
+            for i in syns.synonyms:
+                syn_t["node"].append(node)
+                syn_t["literal"].append(i.literal)
+                syn_t["sense"].append(i.sense)
+                syn_t["lnote"].append(i.lnote)
+                syn_t["nucleus"].append(i.nucleus)
+            for kind, values in (("usage", syns.usages), ("snote", syns.snotes)):
+                for value in values:
+                    links["node"].append(node)
+                    links["kind"].append(kind)
+                    links["target"].append(value)
+                    links["type"].append("")
+            for kind, member in _PAIR_LINKS:
+                for target, typ in getattr(syns, member):
+                    links["node"].append(node)
+                    links["kind"].append(kind)
+                    links["target"].append(target)
+                    links["type"].append(typ)
+            inverted = Counter(wn.m_invedges[pos].get(wnid, ()))
+            for target, rel in syns.ilrs:
+                if inverted[(target, rel)] > 0:
+                    inverted[(target, rel)] -= 1
+                    edges["inv"].append(1)
+                else:
+                    edges["inv"].append(0)
+                dst = nodes.get((target, pos))
+                if dst is None:  # missing target (see Warning W03)
+                    dst = nodes.get((target, ""))
+                    if dst is None:
+                        dst = nodes[(target, "")] = len(ids["node"])
+                        ids["node"].append(dst)
+                        ids["wnid"].append(target)
+                        ids["pos"].append("")
+                edges["src"].append(node)
+                edges["dst"].append(dst)
+                edges["rel"].append(rels.setdefault(rel, len(rels)))
+
+    tables["relations"]["rel"] = list(rels.values())
+    tables["relations"]["name"] = list(rels.keys())
+
+    for name, cols in tables.items():
+        _write_table(dirname, name, cols, fmt)
+    return {name: len(next(iter(cols.values()))) for name, cols in tables.items()}
+
+# Rebuild a WNQuery from tables written by exportColumnar().
+# Relations are not inverted again, as the exported edges already contain the inverted ones (marked as such).
+# Load phases (read_tables, build_synsets, save_synsets, total) and synset counts are recorded in the
+# load statistics (see WNQuery.loadStats()). The garbage collector is paused while the tables are read and
+# the synsets are built, as for the many small objects created it only costs time (they are all kept).
+# @param dirname directory holding the tables
+# @param fmt parquet|npz|csv, the default is detected from the files present
+# @param log file handle for writing warnings while loading
+# @return the new WNQuery object
+# @exception WNExportException for invalid or unavailable format
+def importColumnar(dirname, fmt=None, log=sys.stderr):
+    t_start = time.perf_counter()
+    if fmt is None:
+        fmt = next((fmt for fmt in ("parquet", "npz") if os.path.exists(os.path.join(dirname, "ids." + fmt))),
+                   "csv")
+    fmt = _format(fmt)
+    gcenabled = gc.isenabled()
+    gc.disable()
+    try:
+        tables = {name: _read_table(dirname, name, fmt) for name in _TABLES}
+        t1 = time.perf_counter()
+
+        synsets = _build_synsets(tables)
+        wn = WNQuery.WNQuery(None, log)
+        wn.m_source = dirname
+        ids = tables["ids"]
+        wnids = ids["wnid"]
+        relnames = dict(zip(tables["relations"]["rel"], tables["relations"]["name"]))
+        edges = tables["edges"]
+        for src, dst, rel, inv in zip(edges["src"], edges["dst"], edges["rel"], edges["inv"]):
+            syns = synsets[src]
+            edge = (wnids[dst], relnames[rel])
+            syns.ilrs.append(edge)
+            # restore the bookkeeping of relation inversion (see WNQuery.updateSynsets())
+            if inv:
+                wn.m_stats.edges_inverted += 1
+                wn.m_invedges[syns.pos].setdefault(syns.wnid, []).append(edge)
+            elif ids["pos"][dst] == "" and edge[1] in wn._invRelTable:
+                wn.m_dangling[syns.pos].setdefault(edge[0], []).append((syns.wnid, edge[1]))
+        t2 = time.perf_counter()
+
+        for node in tables["synsets"]["node"]:
+            wn._save_synset(synsets[node], 0)
+    finally:
+        if gcenabled:
+            gc.enable()
+    wn._close_indices()
+    wn._count_synsets()
+    wn.m_stats.phases.update(read_tables=t1 - t_start, build_synsets=t2 - t1, save_synsets=time.perf_counter() - t2,
+                             total=time.perf_counter() - t_start)
+    return wn
+
+# Build the synsets (without relations) from the tables, by node number (None for missing relation targets)
+def _build_synsets(tables):
+    ids = tables["ids"]
+    wnids = ids["wnid"]
+    synsets = [None] * len(wnids)
+    syns_t = tables["synsets"]
+    for i, node in enumerate(syns_t["node"]):
+        syns = synset.Synset()
+        syns.wnid = wnids[node]
+        syns.pos = ids["pos"][node]
+        syns.wnid3 = syns_t["wnid3"][i]
+        syns.definition = syns_t["definition"][i]
+        syns.bcs = syns_t["bcs"][i]
+        syns.stamp = syns_t["stamp"][i]
+        syns.domain = syns_t["domain"][i]
+        syns.nl = syns_t["nl"][i]
+        syns.tnl = syns_t["tnl"][i]
+        synsets[node] = syns
+
+    syn_t = tables["synonyms"]
+    for node, literal, sense, lnote, nucleus in zip(syn_t["node"], syn_t["literal"], syn_t["sense"],
+                                                     syn_t["lnote"], syn_t["nucleus"]):
+        synsets[node].synonyms.append(synset.Synonym(literal, sense, lnote, nucleus))
+
+    members = dict(_PAIR_LINKS)
+    links = tables["links"]
+    for node, kind, target, typ in zip(links["node"], links["kind"], links["target"], links["type"]):
+        if kind == "usage":
+            synsets[node].usages.append(target)
+        elif kind == "snote":
+            synsets[node].snotes.append(target)
+        else:
+            getattr(synsets[node], members[kind]).append((target, typ))
+    return synsets
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8, vim: expandtab:ts=4 -*-
+
+from collections import Counter
+
+try:
+    import numpy
+    import scipy.sparse
+except ImportError:
+    numpy = None  # numpy/scipy are not installed, graph matrices are not available
+
+try:
+    import networkx
+except ImportError:
+    networkx = None  # networkx is not installed, only matrices are available
+
+# Relation graph of a WordNet (WNQuery) as edge arrays, sparse matrices or a NetworkX graph,
+# and word sense disambiguation on it by personalized PageRank.
+# Synsets of a POS are numbered in the order of the synset map of WNQuery (see edgeArrays()).
+# The graph contains all internal relations of the synsets, including the inverted ones added while loading.
+
+class WNGraphException(Exception):
+    def __init__(self, message):
+        self.message = message
+    def __str__(self):
+        return repr(self.message)
+
+def _check():
+    if numpy is None:
+        raise WNGraphException("Relation graph matrices need the numpy and scipy modules")
+
+# Get all relations among the synsets of a POS as integer arrays (edge list).
+# @param wn the WNQuery object
+# @param pos POS of synsets
+# @param relations names of relations to include (None for all)
+# @return dict: ids (list of synset ids, by node number), relations (list of relation names, by code),
+# src, dst, rel (numpy int32 arrays: source node, target node, relation code of every edge),
+# inv (numpy bool array, true for relations added by inversion, see WNQuery.invert_relations()).
+# Relations pointing to missing synsets are left out.
+# @exception WNGraphException if numpy/scipy are not installed
+# @exception InvalidPOSException for invalid POS
+def edgeArrays(wn, pos, relations=None):
+    _check()
+    dat = wn.dat(pos)
+    ids = list(dat)
+    node = {wnid: i for i, wnid in enumerate(ids)}
+    codes = dict()
+    invedges = wn.m_invedges[pos]
+    # flat lists, converted to arrays at once
+    src = []
+    dst = []
+    rel = []
+    inv = []
+    for i, (wnid, syns) in enumerate(dat.items()):
+        inverted = Counter(invedges[wnid]) if wnid in invedges else None
+        for edge in syns.ilrs:
+            target, r = edge
+            j = node.get(target)
+            if j is None or (relations is not None and r not in relations):
+                continue
+            src.append(i)
+            dst.append(j)
+            rel.append(codes.setdefault(r, len(codes)))
+            if inverted and inverted[edge] > 0:
+                inverted[edge] -= 1
+                inv.append(True)
+            else:
+                inv.append(False)
+    return {"ids": ids, "relations": list(codes), "src": numpy.array(src, dtype=numpy.int32),
+            "dst": numpy.array(dst, dtype=numpy.int32), "rel": numpy.array(rel, dtype=numpy.int32),
+            "inv": numpy.array(inv, dtype=bool)}
+
+def _csr(src, dst, n):
+    matrix = scipy.sparse.csr_matrix((numpy.ones(len(src), dtype=numpy.float64), (src, dst)), shape=(n, n))
+    matrix.sum_duplicates()
+    return matrix
+
+# Select edges by origin: all, original (read from the file) or inverted (added by inversion)
+def _select(arrays, edges):
+    if edges == "all":
+        return numpy.ones(len(arrays["src"]), dtype=bool)
+    if edges == "original":
+        return ~arrays["inv"]
+    if edges == "inverted":
+        return arrays["inv"].copy()
+    raise WNGraphException("Invalid edge selection '{0}'".format(edges))
+
+# Build adjacency matrices of the relations among the synsets of a POS.
+# @param wn the WNQuery object
+# @param pos POS of synsets
+# @param relations names of relations to include (None for all)
+# @param combined if true, one matrix of all relations, otherwise one matrix per relation
+# @param edges all, original (only relations read from the file) or inverted (only relations added by inversion)
+# @return (matrices, ids): matrices is a dict relation name -> scipy.sparse CSR matrix (or one matrix if combined),
+# element [i, j] is the number of relations from synset ids[i] to synset ids[j]
+# @exception WNGraphException if numpy/scipy are not installed, or for invalid edge selection
+# @exception InvalidPOSException for invalid POS
+def adjacency(wn, pos, relations=None, combined=False, edges="all"):
+    arrays = edgeArrays(wn, pos, relations)
+    n = len(arrays["ids"])
+    mask = _select(arrays, edges)
+    if combined:
+        return _csr(arrays["src"][mask], arrays["dst"][mask], n), arrays["ids"]
+    res = dict()
+    for code, name in enumerate(arrays["relations"]):
+        m = mask & (arrays["rel"] == code)
+        res[name] = _csr(arrays["src"][m], arrays["dst"][m], n)
+    return res, arrays["ids"]
+
+# Build the adjacency matrix of the relations among the synsets of a POS (all relations in one matrix).
+# @return (matrix, ids), see adjacency()
+def relationMatrix(wn, pos, relations=None):
+    return adjacency(wn, pos, relations, combined=True)
+
+# Build a NetworkX multigraph of the relations among the synsets of a POS.
+# Nodes are synset ids, edges have the attributes rel (relation name) and inverted (see edgeArrays()).
+# @param edges all, original or inverted, see adjacency()
+# @return networkx.MultiDiGraph
+# @exception WNGraphException if numpy/scipy/networkx are not installed, or for invalid edge selection
+# @exception InvalidPOSException for invalid POS
+def toNetworkX(wn, pos, relations=None, edges="all"):
+    if networkx is None:
+        raise WNGraphException("NetworkX export needs the networkx module")
+    arrays = edgeArrays(wn, pos, relations)
+    ids = arrays["ids"]
+    names = arrays["relations"]
+    mask = _select(arrays, edges)
+    graph = networkx.MultiDiGraph()
+    graph.add_nodes_from(ids)
+    graph.add_edges_from((ids[i], ids[j], {"rel": names[r], "inverted": bool(v)}) for i, j, r, v in
+                         zip(arrays["src"][mask].tolist(), arrays["dst"][mask].tolist(),
+                             arrays["rel"][mask].tolist(), arrays["inv"][mask].tolist()))
+    return graph
+
+# Word sense disambiguation by personalized PageRank over the relation graph of a POS.
+# The random walk restarts at the senses (see WNQuery.lookUpLiteral()) of the context words, every word getting
+# the same weight; the senses of a word are ranked by their PageRank. Many contexts are computed at once,
+# by power iteration on a matrix holding one column per context.
+class PPRDisambiguator:
+    # @param wn the WNQuery object
+    # @param pos POS of words to disambiguate
+    # @param relations names of relations to walk (None for all)
+    # @param damping probability of following a relation (instead of restarting)
+    # @param iterations maximum number of iterations
+    # @param tolerance iteration stops when the L1 change of every column is below this
+    # @exception WNGraphException if numpy/scipy are not installed
+    def __init__(self, wn, pos, relations=None, damping=0.85, iterations=30, tolerance=1e-6):
+        matrix, self.m_ids = relationMatrix(wn, pos, relations)
+        self.m_wn = wn
+        self.m_pos = pos
+        self.m_node = {wnid: i for i, wnid in enumerate(self.m_ids)}
+        self.m_damping = damping
+        self.m_iterations = iterations
+        self.m_tolerance = tolerance
+        # column stochastic transition matrix, synsets without relations are marked as dangling
+        outdeg = numpy.asarray(matrix.sum(axis=1)).ravel()
+        self.m_dangling = outdeg == 0
+        inv = numpy.zeros_like(outdeg)
+        inv[~self.m_dangling] = 1.0 / outdeg[~self.m_dangling]
+        self.m_trans = (scipy.sparse.diags(inv) @ matrix).T.tocsr()
+
+    # Get the nodes of the senses of a literal
+    def _senses(self, literal):
+        return [self.m_node[wnid] for wnid in self.m_wn.idx(self.m_pos).get(literal, ()) if wnid in self.m_node]
+
+    # Personalized PageRank of many restart distributions at once.
+    # @param restart dense matrix, one column (summing to 1) per context
+    def _pagerank(self, restart):
+        d = self.m_damping
+        ranks = restart.copy()
+        for _ in range(self.m_iterations):
+            # mass of dangling synsets restarts too
+            new = d * (self.m_trans @ ranks) + (d * ranks[self.m_dangling].sum(axis=0) + (1.0 - d)) * restart
+            delta = numpy.abs(new - ranks).sum(axis=0).max()
+            ranks = new
+            if delta < self.m_tolerance:
+                break
+        return ranks
+
+    def _restart(self, columns):
+        restart = numpy.zeros((len(self.m_ids), len(columns)))
+        for col, words in enumerate(columns):
+            for senses in words:
+                if senses:
+                    # unbuffered, a sense listed twice (literal twice in a synset) gets both shares
+                    numpy.add.at(restart, (senses, col), 1.0 / len(senses))
+            total = restart[:, col].sum()
+            if total > 0:
+                restart[:, col] /= total
+        return restart
+
+    def _ranked(self, senses, ranks, col):
+        return sorted(((self.m_ids[i], float(ranks[i, col])) for i in senses), key=lambda x: -x[1])
+
+    # Rank the senses of all words of each context, using the whole context.
+    # @param contexts list of lists of literals
+    # @param batchsize number of contexts computed at once: each one is a dense column over all synsets of the POS,
+    # a batch takes about 3 * synsets * batchsize * 8 bytes (eg. 90 MB for 120000 synsets and 32 contexts)
+    # @return list (one per context) of lists (one per word) of (synset id, score) pairs, best first
+    def rankContexts(self, contexts, batchsize=32):
+        res = []
+        for start in range(0, len(contexts), batchsize):
+            batch = [[self._senses(literal) for literal in context] for context in contexts[start:start + batchsize]]
+            ranks = self._pagerank(self._restart(batch))
+            for col, words in enumerate(batch):
+                res.append([self._ranked(senses, ranks, col) for senses in words])
+        return res
+
+    # Disambiguate every word of a text by the words in a window around it.
+    # The senses of the word itself are left out of the restart distribution (unless it has no context),
+    # so it does not vote for its own senses.
+    # @param words list of literals
+    # @param window number of words on each side
+    # @param batchsize number of windows computed at once (memory cost: see rankContexts())
+    # @return list (one per word) of lists of (synset id, score) pairs, best first (empty for unknown words)
+    def disambiguate(self, words, window=5, batchsize=32):
+        senses = [self._senses(literal) for literal in words]
+        res = []
+        for start in range(0, len(words), batchsize):
+            positions = list(range(start, min(start + batchsize, len(words))))
+            columns = []
+            for i in positions:
+                context = senses[max(0, i - window):i] + senses[i + 1:i + 1 + window]
+                columns.append(context if any(context) else [senses[i]])
+            ranks = self._pagerank(self._restart(columns))
+            for col, i in enumerate(positions):
+                res.append(self._ranked(senses[i], ranks, col))
+        return res
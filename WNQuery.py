@@ -2,8 +2,13 @@
 # -*- coding: utf-8, vim: expandtab:ts=4 -*-
 
 import sys
+import gzip
 import math
-from collections import defaultdict
+import time
+import threading
+import tracemalloc
+from types import MappingProxyType
+from collections import defaultdict, Counter, deque, OrderedDict
 
 import synset
 import WNXMLParser
@@ -23,11 +28,206 @@ class InvalidPOSException(Exception):
     def __str__(self):
         return repr(self.message)
 
+# Statistics about loading (and updating) a WNQuery object, see WNQuery.loadStats()
+class LoadStats:
+    def __init__(self):
+        self.phases = dict()          # phase name -> seconds: parse, save_synsets, invert_relations, total
+        self.peak_memory = None       # peak traced memory during loading in bytes (only when profiling)
+        self.synsets = dict()         # pos -> number of synsets
+        self.edges_inverted = 0       # number of inverse relations added
+        self.warnings = Counter()     # warning code (W01...) -> count
+        self.log_lines = 0            # number of lines written to the log
+        self.log_time = 0.0           # seconds spent writing the log (only when profiling)
+
+    def asDict(self):
+        return {"phases": dict(self.phases), "peak_memory": self.peak_memory, "synsets": dict(self.synsets),
+                "edges_inverted": self.edges_inverted, "warnings": dict(self.warnings),
+                "log_lines": self.log_lines, "log_time": self.log_time}
+
+    def __str__(self):
+        return "LoadStats({0})".format(self.asDict())
+
+# Per-query statistics of an instrumented WNQuery object, see WNQuery.enableInstrumentation()
+class QueryStats:
+    def __init__(self, slow_threshold, slowlog, slowlog_size):
+        self.slow_threshold = slow_threshold  # seconds, queries taking at least this long are logged
+        self.slowlog = slowlog                # file handle to write slow queries to (or None)
+        self.slow = deque(maxlen=slowlog_size)  # the last slow queries: dicts with method, args, seconds, nodes, edges
+        self.methods = dict()                 # method name -> dict of counters, see record()
+        self.local = threading.local()        # per thread state of the query in progress
+        self.lock = threading.Lock()
+
+    # Record a finished (outermost) query.
+    # Latencies are put into a histogram of power of 2 microsecond buckets (bucket k: < 2^k us).
+    def record(self, name, args, secs, nodes, edges, hits, misses):
+        with self.lock:
+            m = self.methods.get(name)
+            if m is None:
+                m = self.methods[name] = {"count": 0, "time": 0.0, "max": 0.0, "nodes": 0, "edges": 0,
+                                          "cache_hits": 0, "cache_misses": 0, "histogram": Counter()}
+            m["count"] += 1
+            m["time"] += secs
+            m["max"] = max(m["max"], secs)
+            m["nodes"] += nodes
+            m["edges"] += edges
+            m["cache_hits"] += hits
+            m["cache_misses"] += misses
+            m["histogram"][int(secs * 1e6).bit_length()] += 1
+            if secs >= self.slow_threshold:
+                entry = {"method": name, "args": repr(args)[:200], "seconds": secs, "nodes": nodes, "edges": edges}
+                self.slow.append(entry)
+                if self.slowlog is not None:
+                    print("Slow query: {0}{1} {2:.6f} s, {3} nodes, {4} edges".format(name, entry["args"], secs, nodes, edges),
+                          file=self.slowlog)
+
+    # Write a summary: per method count, mean and max latency, nodes and edges per query, cache hits and misses.
+    # @param os the output stream to write to
+    def write(self, os):
+        print("Method\tcount\tmean (us)\tmax (us)\tnodes/query\tedges/query\tcache hits\tcache misses", file=os)
+        with self.lock:
+            for name, m in sorted(self.methods.items()):
+                print("{0}\t{1}\t{2:.1f}\t{3:.1f}\t{4:.1f}\t{5:.1f}\t{6}\t{7}".format(
+                    name, m["count"], m["time"] / m["count"] * 1e6, m["max"] * 1e6, m["nodes"] / m["count"],
+                    m["edges"] / m["count"], m["cache_hits"], m["cache_misses"]), file=os)
+
+# Lowest common subsumer index of the hierarchy defined by a relation in one POS, see WNQuery.lcsIndex().
+# Synsets whose ancestors form a single chain up to a root (a synset without the relation) make up a forest.
+# Their LCS is answered in constant time: lowest common ancestor by range minimum query (sparse table)
+# over the Euler tour of the forest. Synsets with multiple parents (or reaching one, or a cycle, or a missing
+# synset) fall back to breadth first search of both ancestor sets (see WNQuery.lowestCommonSubsumer()).
+class LCSIndex:
+    def __init__(self, wn, pos, relation):
+        self.wn = wn
+        self.pos = pos
+        self.relation = relation
+        dat = wn.dat(pos)
+
+        # find tree synsets: resolve single parent chains, memoized
+        parent = dict()
+        tree = dict()  # synset id -> true if tree synset
+        nodes = edges = 0
+        for wnid in dat:
+            path = []
+            onpath = set()
+            curr = wnid
+            while True:
+                if curr in tree:
+                    res = tree[curr]
+                    break
+                syns = dat.get(curr)
+                if syns is None or curr in onpath:  # missing synset or cycle
+                    res = False
+                    break
+                nodes += 1
+                edges += len(syns.ilrs)
+                targets = {target for target, rel in syns.ilrs if rel == relation}
+                if len(targets) > 1:
+                    tree[curr] = res = False
+                    break
+                if not targets:  # root
+                    parent[curr] = None
+                    tree[curr] = res = True
+                    break
+                parent[curr] = targets.pop()
+                path.append(curr)
+                onpath.add(curr)
+                curr = parent[curr]
+            for i in path:
+                tree[i] = res
+        wn._countSteps(nodes, edges)
+
+        # number tree synsets (0 is a virtual root above all roots), depth of roots is 1
+        self.m_ids = [None]
+        self.m_node = dict()
+        children = defaultdict(list)
+        for wnid, istree in tree.items():
+            if istree:
+                self.m_node[wnid] = len(self.m_ids)
+                self.m_ids.append(wnid)
+        for wnid, node in self.m_node.items():
+            children[self.m_node[parent[wnid]] if parent[wnid] is not None else 0].append(node)
+
+        # Euler tour (iterative DFS), first and last positions of every node in it
+        self.m_depth = [0] * len(self.m_ids)
+        self.m_first = [0] * len(self.m_ids)
+        self.m_last = [0] * len(self.m_ids)
+        euler = []
+        stack = [(0, iter(children.get(0, ())))]
+        euler.append(0)
+        while stack:
+            node, it = stack[-1]
+            child = next(it, None)
+            if child is None:
+                stack.pop()
+                self.m_last[node] = len(euler) - 1
+                if stack:
+                    euler.append(stack[-1][0])
+            else:
+                self.m_depth[child] = self.m_depth[node] + 1
+                self.m_first[child] = len(euler)
+                euler.append(child)
+                stack.append((child, iter(children.get(child, ()))))
+
+        # sparse table: level k holds the shallowest node of euler[i:i + 2**k]
+        depth = self.m_depth
+        self.m_sparse = [euler]
+        k = 1
+        while (1 << k) <= len(euler):
+            prev = self.m_sparse[-1]
+            half = 1 << (k - 1)
+            self.m_sparse.append([a if depth[a] <= depth[b] else b
+                                  for a, b in zip(prev, prev[half:])])
+            k += 1
+
+    # Get the lowest common subsumer of two synsets (see WNQuery.lowestCommonSubsumer()).
+    # @param reach optional dict (synset id -> ancestor distances) shared between calls, for the fallback search
+    # @return (lcs id, distance from wnid1, distance from wnid2), or (None, None, None) if not connected
+    def query(self, wnid1, wnid2, addArtificialTop=False, reach=None):
+        n1 = self.m_node.get(wnid1)
+        n2 = self.m_node.get(wnid2)
+        if n1 is None or n2 is None:
+            return self._fallback(wnid1, wnid2, addArtificialTop, reach)
+        l, r = self.m_first[n1], self.m_first[n2]
+        if l > r:
+            l, r = r, l
+        k = (r - l + 1).bit_length() - 1
+        a, b = self.m_sparse[k][l], self.m_sparse[k][r - (1 << k) + 1]
+        lca = a if self.m_depth[a] <= self.m_depth[b] else b
+        if lca == 0:  # different trees
+            if addArtificialTop:
+                return "#TOP#", self.m_depth[n1], self.m_depth[n2]
+            return None, None, None
+        return self.m_ids[lca], self.m_depth[n1] - self.m_depth[lca], self.m_depth[n2] - self.m_depth[lca]
+
+    # Check if ancestor is reachable from wnid by the relation (or is the same synset).
+    # @param reach optional dict (synset id -> ancestor distances) shared between calls, for the fallback search
+    def isAncestor(self, wnid, ancestor, reach=None):
+        n = self.m_node.get(wnid)
+        a = self.m_node.get(ancestor)
+        if n is not None and a is not None:
+            return self.m_first[a] <= self.m_first[n] <= self.m_last[a]
+        if n is not None:  # the ancestors of a tree synset are all tree synsets
+            return False
+        if reach is None:
+            reach = dict()
+        if wnid not in reach:
+            reach[wnid] = self.wn._ancestorDistances(wnid, self.pos, self.relation)
+        return ancestor in reach[wnid][0]
+
+    def _fallback(self, wnid1, wnid2, addTop, reach):
+        wn = self.wn
+        if reach is None:
+            reach = dict()
+        for wnid in (wnid1, wnid2):
+            if wnid not in reach:
+                reach[wnid] = wn._ancestorDistances(wnid, self.pos, self.relation)
+        return wn._lcs(reach[wnid1], reach[wnid2], self.pos, self.relation, addTop)
+
 # Class for querying WordNet, read from VisDic XML file
 # Character encoding of all results is UTF-8
 class WNQuery:
     # Constructor. Create the object: read XML file, create internal indices, invert invertable relations etc.
-    # @param wnxmlfilename file name of VisDic XML file holding the WordNet you want to query
+    # @param wnxmlfilename file name of VisDic XML file holding the WordNet you want to query (None creates an empty object)
     # @param log file handle for writing warnings (e.g. invalid POS etc.) to while loading. The default value creates a logger to stderr.
     # The following warnings may be produced:
     # Warning W01: synset with id already exists
@@ -35,8 +235,23 @@ class WNQuery:
     # Warning W03: synset is missing (the target synset, when checking when inverting relations)
     # Warning W04: self-referencing relation in synset
     # @exception WNQueryException thrown if input parsing error occurs
-    def __init__(self, wnxmlfilename, log=sys.stderr):
+    # See updateSynsets() and applyDelta() for applying changes without reloading.
+    # @param profile if true, also measure peak memory (tracemalloc) and time spent on logging (slows loading down)
+    # @param stats_hook if given, function called with the LoadStats object (see loadStats()) when loading is done
+    # @param fields if given, only these synset fields are kept (ID and POS always are), the others are skipped
+    # while parsing and left empty, see WNXMLParser.FIELDS (eg. ("synonyms", "ilrs") for a lean object)
+    # @exception WNQueryException for unknown field names
+    def __init__(self, wnxmlfilename, log=sys.stderr, profile=False, stats_hook=None, fields=None):
+        if fields is not None:
+            fields = frozenset(fields)
+            if not fields <= WNXMLParser.FIELDS:
+                raise WNQueryException("Unknown synset field(s): {0}".format(
+                    ", ".join(sorted(fields - WNXMLParser.FIELDS))))
         self.log = log
+        self.m_source = wnxmlfilename  # file (or directory, see WNExport.importColumnar()) loaded, None if unknown
+        self.m_fields = fields
+        self.m_profile = profile
+        self.m_stats = LoadStats()
 
         # synset ids to synsets
         # typedef std::map<std::string, LibWNXML::Synset> tdat;
@@ -53,8 +268,58 @@ class WNQuery:
         self.m_vidx = defaultdict(list)
         self.m_aidx = defaultdict(list)
         self.m_bidx = defaultdict(list)
+
+        # external ids to (synset id, pos) pairs of local synsets (all POS)
+        # A.K.A. defaultdict(list) in Python
+        self.m_id3idx = defaultdict(list)   # PWN3.0 synset ids (ID3)
+        self.m_elridx = defaultdict(list)   # ELR targets (PWN2.0)
+        self.m_elr3idx = defaultdict(list)  # ELR3 targets (PWN3.0)
+        self.m_ekszidx = defaultdict(list)  # EKSz sense ids
         self._invRelTable = self._createInvRelTable()
 
+        # (attribute, pos) -> {attribute value -> frozenset of synset ids}, built lazily by attridx()
+        self.m_attridx = dict()
+
+        # bookkeeping of relation inversion, needed for incremental updates (see updateSynsets())
+        # pos -> {synset id -> inverted (target-id, rel-type) pairs added to the synset}
+        self.m_invedges = {"n": dict(), "v": dict(), "a": dict(), "b": dict()}
+        # pos -> {missing synset id -> (source-id, rel-type) pairs of invertable relations pointing to it}
+        self.m_dangling = {"n": dict(), "v": dict(), "a": dict(), "b": dict()}
+        # incremented on every update, so that derived structures (eg. SemFeatures closures) can detect changes
+        self.m_generation = 0
+        # true after freeze(): internal structures are immutable, the object can be shared between threads
+        self.m_frozen = False
+
+        self.LeaCho_D = {}
+        self.LeaCho_noconnect = - 1.0
+
+        # (pos, relation) -> {synset id -> depth}, see depthTable()
+        self.m_depth = dict()
+        # (pos, relation) -> {synset id -> information content}, see icTable()
+        self.m_ic = dict()
+        # pos -> {synset id -> frequency} loaded by loadFrequencies(), used by icTable()
+        self.m_freq = dict()
+        # (pos, relation) -> LCSIndex, see lcsIndex()
+        self.m_lcsidx = dict()
+        # (pos, relation) -> {synset id -> sources of original relations pointing to it}, see _reverseEdges()
+        self.m_revedges = dict()
+        # bounded LRU cache of expand(): key -> result, guarded by its lock (the only state written by
+        # queries of a frozen object), cleared when m_generation changes
+        self.m_expcache = OrderedDict()
+        self.m_expcachegen = 0
+        self.m_explock = threading.Lock()
+
+        # no file: create an empty object to be filled by an importer (eg. WNExport.importColumnar)
+        if wnxmlfilename is None:
+            return
+
+        if profile and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            started_tracing = True
+        else:
+            started_tracing = False
+        t_start = time.perf_counter()
+
         # open file
         try:
             fh = open(wnxmlfilename, "r", encoding="UTF-8")
@@ -62,17 +327,31 @@ class WNQuery:
             raise WNQueryException("Could not open file: {0} because: {1}".format(wnxmlfilename, e))
 
         # parse input file
-        for syns, lcnt in WNXMLParser.WNXMLParserContentHandler().parse(fh):
+        t0 = time.perf_counter()
+        try:
+            syns_list = WNXMLParser.WNXMLParserContentHandler(fields).parse(fh)
+        finally:
+            fh.close()
+        t1 = time.perf_counter()
+        for syns, lcnt in syns_list:
             self._save_synset(syns, lcnt) # store next synset
-
-        fh.close()
+        del syns_list
+        t2 = time.perf_counter()
         # invert relations
         self.invert_relations()
+        t3 = time.perf_counter()
         # Close defaultdict for safety
-        self.m_nidx.default_factory = None
-        self.m_vidx.default_factory = None
-        self.m_aidx.default_factory = None
-        self.m_bidx.default_factory = None
+        self._close_indices()
+
+        self._count_synsets()
+        self.m_stats.phases.update(parse=t1 - t0, save_synsets=t2 - t1, invert_relations=t3 - t2,
+                                   total=time.perf_counter() - t_start)
+        if profile and tracemalloc.is_tracing():
+            self.m_stats.peak_memory = tracemalloc.get_traced_memory()[1]
+            if started_tracing:
+                tracemalloc.stop()
+        if stats_hook is not None:
+            stats_hook(self.loadStats())
 
         if DEBUG:
             for key, val in self.m_ndat.items():
@@ -98,12 +377,171 @@ class WNQuery:
                 for vi in val:
                     print("{0}: {1}".format(key, vi), file=sys.stdout)
 
-        self.LeaCho_D = {}
-        self.LeaCho_noconnect = - 1.0
+    # Close the defaultdict indices, so that lookups of missing keys do not insert them
+    def _close_indices(self):
+        self.m_nidx.default_factory = None
+        self.m_vidx.default_factory = None
+        self.m_aidx.default_factory = None
+        self.m_bidx.default_factory = None
+        self.m_id3idx.default_factory = None
+        self.m_elridx.default_factory = None
+        self.m_elr3idx.default_factory = None
+        self.m_ekszidx.default_factory = None
+
+    # Public query methods wrapped by enableInstrumentation()
+    _instrumented = ("lookUpID", "lookUpLiteral", "lookUpLiteralS", "lookUpSense", "lookUpRelation", "traceRelation",
+                     "traceRelationD", "traceRelationOS", "getMaxDepth", "getSubGraphSize", "trace_rel_recS",
+                     "isIDConnectedWith", "isLiteralConnectedWith", "isLiteralCompatibleWithSynset",
+                     "literalsCompatibleWithSynset", "areSynonyms",
+                     "similarityLeacockChodorow", "simLeaCho", "getLeaChoD", "getReach", "attridx",
+                     "lowestCommonSubsumer", "lcsIndex", "synsetSimilarity", "similarity", "similarityBatch",
+                     "lookUpAttribute", "selectSynsets", "lookUpExternal", "translateExternal", "lookUpNeighbourhood",
+                     "expand", "expandBulk", "iterTraceRelation", "iterTraceRelationOS")
+    # Methods visiting one synset (given by their first two arguments: id, pos) and scanning its relations
+    _stepMethods = frozenset(("lookUpRelation", "getReach"))
+    # Generator methods: timed while producing items, recorded when exhausted or closed
+    _generatorMethods = frozenset(("iterTraceRelation", "iterTraceRelationOS"))
+
+    # Turn on per-query instrumentation: latency histograms, synsets visited and relations scanned by traversals,
+    # cache hits (Leacock-Chodorow D, attribute indices, depth/IC tables, LCS indices, expand()) and a log of slow
+    # queries. Traversals counted: lookUpRelation(), getReach(), relation traces, lookUpNeighbourhood(), ancestor
+    # searches of the similarity measures (including the fallback of the LCS index) and building the depth table and
+    # the LCS index. Other scans (eg. selectSynsets(), lookUpAttribute()) only report their time.
+    # Only the outermost call of a query is recorded, recursive and nested calls are counted into it.
+    # The public methods are wrapped on this object only, so when instrumentation is off, there is no overhead at all.
+    # @param slow_threshold queries taking at least this many seconds are put to the slow query log
+    # @param slowlog file handle to write slow queries to (besides keeping the last slowlog_size of them)
+    # @return the QueryStats object collecting the statistics (also available from queryStats())
+    def enableInstrumentation(self, slow_threshold=0.1, slowlog=None, slowlog_size=100):
+        self.disableInstrumentation()
+        stats = QueryStats(slow_threshold, slowlog, slowlog_size)
+        for name in self._instrumented:
+            setattr(self, name, self._instrument(name, getattr(self, name), stats))
+        self.m_querystats = stats
+        return stats
+
+    # Turn off per-query instrumentation (collected statistics remain available from the returned object).
+    def disableInstrumentation(self):
+        for name in self._instrumented:
+            self.__dict__.pop(name, None)
+        stats = self.__dict__.pop("m_querystats", None)
+        return stats
+
+    # Get the QueryStats object of instrumentation, None if it is not enabled.
+    def queryStats(self):
+        return self.__dict__.get("m_querystats")
+
+    def _instrument(self, name, method, stats):
+        step = name in self._stepMethods
+        local = stats.local
+        if name in self._generatorMethods:
+            return self._instrumentGenerator(name, method, stats)
+
+        def wrapper(*args, **kwargs):
+            depth = getattr(local, "depth", 0)
+            if depth == 0:
+                local.nodes = local.edges = local.hits = local.misses = 0
+            if step:
+                try:
+                    syns = self.dat(args[1]).get(args[0])
+                except (IndexError, InvalidPOSException):
+                    syns = None
+                if syns is not None:
+                    local.nodes += 1
+                    local.edges += len(syns.ilrs)
+            elif name == "getLeaChoD" or name == "attridx":
+                cache = self.LeaCho_D if name == "getLeaChoD" else self.m_attridx
+                key = tuple(args[:2]) if name == "getLeaChoD" else (args[0], args[1])
+                if key in cache:
+                    local.hits += 1
+                else:
+                    local.misses += 1
+            local.depth = depth + 1
+            t0 = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                local.depth = depth
+                if depth == 0:
+                    stats.record(name, args, time.perf_counter() - t0, local.nodes, local.edges, local.hits, local.misses)
+        return wrapper
+
+    # Wrap a generator method: inside a query it is counted into that query, otherwise it is a query of its own,
+    # whose counters are swapped in only while the generator runs (so the consumer may run other queries meanwhile).
+    def _instrumentGenerator(self, name, method, stats):
+        local = stats.local
+
+        def wrapper(*args, **kwargs):
+            if getattr(local, "depth", 0) > 0:
+                yield from method(*args, **kwargs)
+                return
+            counts = (0, 0, 0, 0)
+            elapsed = 0.0
+            it = method(*args, **kwargs)
+            try:
+                while True:
+                    local.depth = 1
+                    local.nodes, local.edges, local.hits, local.misses = counts
+                    t0 = time.perf_counter()
+                    try:
+                        item = next(it)
+                    except StopIteration:
+                        return
+                    finally:
+                        elapsed += time.perf_counter() - t0
+                        counts = (local.nodes, local.edges, local.hits, local.misses)
+                        local.depth = 0
+                    yield item
+            finally:
+                it.close()
+                stats.record(name, args, elapsed, *counts)
+        return wrapper
+
+    # Count synsets visited and relations scanned by a traversal into the instrumented query in progress
+    # (see enableInstrumentation()). Traversals call it once, with their totals.
+    def _countSteps(self, nodes, edges):
+        stats = self.__dict__.get("m_querystats")
+        if stats is not None and getattr(stats.local, "depth", 0) > 0:
+            stats.local.nodes += nodes
+            stats.local.edges += edges
+
+    # Count a cache hit or miss into the instrumented query in progress.
+    def _countCache(self, hit):
+        stats = self.__dict__.get("m_querystats")
+        if stats is not None and getattr(stats.local, "depth", 0) > 0:
+            if hit:
+                stats.local.hits += 1
+            else:
+                stats.local.misses += 1
+
+    # Write a log message (counted, and timed when profiling).
+    def _logmsg(self, message):
+        self.m_stats.log_lines += 1
+        if self.m_profile:
+            t0 = time.perf_counter()
+            print(message, file=self.log)
+            self.m_stats.log_time += time.perf_counter() - t0
+        else:
+            print(message, file=self.log)
+
+    # Write a warning to the log, counting it by its code.
+    def _warn(self, code, message):
+        self.m_stats.warnings[code] += 1
+        self._logmsg("Warning {0}: {1}".format(code, message))
+
+    # Get statistics about loading: phase timings, peak memory (if profiling), synsets per POS, number of
+    # inverted relations and warnings by code. Counters also include later updates (see updateSynsets()).
+    # @return LoadStats object
+    def loadStats(self):
+        return self.m_stats
+
+    def _count_synsets(self):
+        self.m_stats.synsets = {pos: len(self.dat(pos)) for pos in ("n", "v", "a", "b")}
 
     # Write statistics about number of synsets, word senses for each POS.
     # @param os the output stream to write to
-    def writeStats(self, os):
+    # @param extended if true, also write load statistics (see loadStats())
+    def writeStats(self, os, extended=False):
         nidx_len = 0
         for it in self.idx("n").values():
             nidx_len += len(it)
@@ -121,6 +559,61 @@ class WNQuery:
         print("Verbs\t\t{0}\t\t{1}\t\t{2}".format(len(self.dat("v")), vidx_len, len(self.idx("v"))), file=os)
         print("Adjectives\t{0}\t\t{1}\t\t{2}".format(len(self.dat("a")), aidx_len, len(self.idx("a"))), file=os)
         print("Adverbs\t\t{0}\t\t{1}\t\t{2}".format(len(self.dat("b")), bidx_len, len(self.idx("b"))), file=os)
+        if extended:
+            stats = self.loadStats()
+            for phase, secs in stats.phases.items():
+                print("Load phase {0}:\t{1:.3f} s".format(phase, secs), file=os)
+            if stats.peak_memory is not None:
+                print("Peak memory:\t{0:.1f} MB".format(stats.peak_memory / 1048576.0), file=os)
+            print("Inverted relations:\t{0}".format(stats.edges_inverted), file=os)
+            for code, cnt in sorted(stats.warnings.items()):
+                print("Warnings {0}:\t{1}".format(code, cnt), file=os)
+            print("Log lines:\t{0}".format(stats.log_lines), file=os)
+
+    # Write all synsets (or those of one POS) as a VisDic XML document, including header and footer.
+    # Synsets are serialized with Synset.toXML() (they are not modified) and written in chunks.
+    # @param out the output stream to write to
+    # @param pos if given, only synsets of this POS are written, otherwise all POS (n, v, a, b)
+    # @param chunksize number of synsets to collect before writing them out
+    # @return number of synsets written
+    # @exception InvalidPOSException for invalid POS
+    def writeXML(self, out, pos=None, chunksize=1000):
+        poses = ("n", "v", "a", "b") if pos is None else (pos,)
+        dats = [self.dat(p) for p in poses]
+        synset.Synset.writeXMLHeader(None, out)
+        cnt = 0
+        buf = []
+        for dat in dats:
+            for syns in dat.values():
+                buf.append(syns.toXML())
+                if len(buf) >= chunksize:
+                    buf.append("")
+                    out.write("\n".join(buf))
+                    cnt += len(buf) - 1
+                    buf = []
+        if buf:
+            buf.append("")
+            out.write("\n".join(buf))
+            cnt += len(buf) - 1
+        synset.Synset.writeXMLFooter(None, out)
+        return cnt
+
+    # Like writeXML(), but to a file. The output is gzip compressed if compress is true,
+    # or if it is not given and the file name ends with '.gz'.
+    # @param filename name of output file
+    # @exception WNQueryException if the file could not be opened
+    def saveXML(self, filename, pos=None, compress=None):
+        if compress is None:
+            compress = filename.endswith(".gz")
+        try:
+            if compress:
+                fh = gzip.open(filename, "wt", encoding="UTF-8")
+            else:
+                fh = open(filename, "w", encoding="UTF-8", buffering=1 << 20)
+        except (OSError, IOError) as e:
+            raise WNQueryException("Could not open file: {0} because: {1}".format(filename, e))
+        with fh:
+            return self.writeXML(fh, pos)
 
     def _save_synset(self, syns, lcnt):
         if syns.empty():
@@ -128,34 +621,64 @@ class WNQuery:
         try:
             # check if id already exists, print warning if yes
             if syns.wnid in self.dat(syns.pos):
-                print("Warning W01: synset with this id ({0}) already exists (input line {1})".format(syns.wnid, lcnt), file=self.log)
+                self._warn("W01", "synset with this id ({0}) already exists (input line {1})".format(syns.wnid, lcnt))
                 return
 
             # store synset
             self.dat(syns.pos)[syns.wnid] = syns
             # index literals
             for i in syns.synonyms:
-                self.idx(syns.pos)[i.literal].append(syns.wnid)
+                self.idx(syns.pos).setdefault(i.literal, []).append(syns.wnid)
+            # index external links
+            self._index_external(syns)
 
         except InvalidPOSException as e:
-            print("Warning W02: {0} for synset in input line {1}".format(e, lcnt), file=self.log)
+            self._warn("W02", "{0} for synset in input line {1}".format(e, lcnt))
+
+    # Add synset to the external id indices (ID3, ELR, ELR3, EKSZ).
+    # Entries with empty targets (e.g. EQ_* tags of old VisDic files) are skipped.
+    def _index_external(self, syns):
+        entry = (syns.wnid, syns.pos)
+        for index, target in self._external_keys(syns):
+            index.setdefault(target, []).append(entry)
+
+    # Remove synset from the external id indices.
+    def _unindex_external(self, syns):
+        entry = (syns.wnid, syns.pos)
+        for index, target in self._external_keys(syns):
+            entries = index.get(target)
+            if entries and entry in entries:
+                entries.remove(entry)
+                if not entries:
+                    del index[target]
+
+    # (index, key) pairs of a synset in the external id indices
+    def _external_keys(self, syns):
+        res = []
+        if syns.wnid3:
+            res.append((self.m_id3idx, syns.wnid3))
+        for index, links in ((self.m_elridx, syns.elrs), (self.m_elr3idx, syns.elrs3), (self.m_ekszidx, syns.ekszlinks)):
+            for target, _ in links:
+                if target:
+                    res.append((index, target))
+        return res
 
     # Create the inverse pairs of all reflexive relations in all POS.
     # Ie. if rel points from s1 to s2, mark inv(rel) from s2 to s1.
     # see body of _invRelTable().
     def invert_relations(self):
         # nouns
-        print("Inverting relations for nouns...", file=self.log)
-        self._inv_rel_pos(self.m_ndat)
+        self._logmsg("Inverting relations for nouns...")
+        self._inv_rel_pos("n")
         # verbs
-        print("Inverting relations for verbs...", file=self.log)
-        self._inv_rel_pos(self.m_vdat)
+        self._logmsg("Inverting relations for verbs...")
+        self._inv_rel_pos("v")
         # adjectives
-        print("Inverting relations for adjectives...", file=self.log)
-        self._inv_rel_pos(self.m_adat)
+        self._logmsg("Inverting relations for adjectives...")
+        self._inv_rel_pos("a")
         # adverbs
-        print("Inverting relations for adverbs...", file=self.log)
-        self._inv_rel_pos(self.m_bdat)
+        self._logmsg("Inverting relations for adverbs...")
+        self._inv_rel_pos("b")
 
     # create inversion table
     def _createInvRelTable(self):
@@ -181,26 +704,244 @@ class WNQuery:
         inv["causes"]                  = "caused_by"
         return inv
 
-    def _inv_rel_pos(self, dat):
+    def _inv_rel_pos(self, pos):
         # for all synsets
-        for key, val in sorted(dat.items()):
-            # for all relations of synset
-            for synset_id, rel in sorted(val.ilrs):
-                # check if invertable
-                if rel in self._invRelTable:
-                    invr = self._invRelTable[rel]
-                    # check if target exists
-                    if synset_id not in dat:
-                        print("Warning W03: synset {0} is missing ('{1}' target from synset {2})".format(synset_id, rel, key), file=self.log)
+        for key, val in sorted(self.dat(pos).items()):
+            self._inv_rel_synset(val, pos)
+
+    # Add the inverse pairs of the original (ie. not inverted) relations of synset to their targets.
+    def _inv_rel_synset(self, val, pos):
+        dat = self.dat(pos)
+        key = val.wnid
+        # for all relations of synset
+        for synset_id, rel in sorted(self._originalRelations(val, pos)):
+            # check if invertable
+            if rel in self._invRelTable:
+                invr = self._invRelTable[rel]
+                # check if target exists
+                if synset_id not in dat:
+                    self._warn("W03", "synset {0} is missing ('{1}' target from synset {2})".format(synset_id, rel, key))
+                    # remember it, the target may be added later
+                    self.m_dangling[pos].setdefault(synset_id, []).append((key, rel))
+                else:
+                    tt = dat[synset_id]
+                    # check wether target is not the same as source
+                    if tt.wnid == val.wnid:
+                        self._warn("W04", "self-referencing relation '{0}' for synset {1}".format(invr, val.wnid))
                     else:
-                        tt = dat[synset_id]
-                        # check wether target is not the same as source
-                        if tt.wnid == val.wnid:
-                            print("Warning W04: self-referencing relation '{0}' for synset {1}".format(invr, val.wnid), file=self.log)
-                        else:
-                            # add inverse to target synset
-                            tt.ilrs.append((key, invr))
-                            print("Added inverted relation (target={0},type={1}) to synset {2}".format(key, invr, tt.wnid), file=self.log)
+                        # add inverse to target synset
+                        self._add_inverse(tt, (key, invr), pos)
+
+    def _add_inverse(self, tt, edge, pos):
+        tt.ilrs.append(edge)
+        self.m_invedges[pos].setdefault(tt.wnid, []).append(edge)
+        self.m_stats.edges_inverted += 1
+        self._logmsg("Added inverted relation (target={0},type={1}) to synset {2}".format(edge[0], edge[1], tt.wnid))
+
+    # Get the original relations of synset, ie. its relations without the ones added by inversion.
+    def _originalRelations(self, syns, pos):
+        inv = self.m_invedges[pos].get(syns.wnid)
+        if not inv:
+            return list(syns.ilrs)
+        cnt = Counter(inv)
+        res = []
+        for edge in syns.ilrs:
+            if cnt[edge] > 0:
+                cnt[edge] -= 1
+            else:
+                res.append(edge)
+        return res
+
+    # Withdraw the inverse pairs of the original relations of synset from their targets
+    # (the reverse of _inv_rel_synset()).
+    def _withdraw_inv_rel_synset(self, val, pos):
+        dat = self.dat(pos)
+        key = val.wnid
+        for synset_id, rel in self._originalRelations(val, pos):
+            if rel in self._invRelTable and synset_id != key:
+                if synset_id in dat:
+                    edge = (key, self._invRelTable[rel])
+                    tt = dat[synset_id]
+                    inv = self.m_invedges[pos].get(synset_id)
+                    if inv and edge in inv:
+                        tt.ilrs.remove(edge)
+                        inv.remove(edge)
+                        if not inv:
+                            del self.m_invedges[pos][synset_id]
+                else:
+                    sources = self.m_dangling[pos].get(synset_id)
+                    if sources and (key, rel) in sources:
+                        sources.remove((key, rel))
+                        if not sources:
+                            del self.m_dangling[pos][synset_id]
+
+    # Apply a delta to the loaded WordNet without reloading it.
+    # The delta is a VisDic XML file of added or changed synsets. A synset record holding only ID and POS
+    # (no literals, relations or definition) means that the synset is to be removed.
+    # @param deltafilename file name of the delta XML file
+    # @return Counter of synsets 'added', 'changed' and 'removed'
+    # @exception WNQueryException thrown if input parsing error occurs
+    def applyDelta(self, deltafilename):
+        try:
+            fh = open(deltafilename, "r", encoding="UTF-8")
+        except (OSError, IOError) as e:
+            raise WNQueryException("Could not open file: {0} because: {1}".format(deltafilename, e))
+        changed = []
+        removed = []
+        with fh:
+            for syns, lcnt in WNXMLParser.WNXMLParserContentHandler().parse(fh):
+                if syns.empty():
+                    continue
+                if not syns.synonyms and not syns.ilrs and not syns.definition:
+                    removed.append((syns.wnid, syns.pos))
+                else:
+                    # the full record is read to tell removals apart, then projected like the loaded ones
+                    changed.append(WNXMLParser.projectSynset(syns, self.m_fields))
+        return self.updateSynsets(changed, removed)
+
+    # Add, replace or remove synsets, updating indices and inverted relations in time proportional to the change.
+    # Relations of the given synsets are taken as original relations and are inverted, inverse relations of
+    # the replaced/removed synsets are withdrawn. Relations pointing to a changed synset from others are kept.
+    # The following warnings may be produced (besides W02-W04):
+    # Warning W05: synset to remove does not exist
+    # @param synsets iterable of new or changed Synset objects
+    # @param removed iterable of (synset id, pos) pairs of synsets to remove
+    # @return Counter of synsets 'added', 'changed' and 'removed'
+    # @exception WNQueryException if the object is frozen
+    def updateSynsets(self, synsets=(), removed=()):
+        if self.m_frozen:
+            raise WNQueryException("WNQuery object is frozen, it can not be updated")
+        cnt = Counter()
+        backrel = {invr: rel for rel, invr in self._invRelTable.items()}
+        for wnid, pos in removed:
+            try:
+                if wnid not in self.dat(pos):
+                    self._warn("W05", "synset to remove does not exist ({0}, {1})".format(wnid, pos))
+                    continue
+            except InvalidPOSException as e:
+                self._warn("W02", "{0} for synset {1} to remove".format(e, wnid))
+                continue
+            old = self._remove_synset(wnid, pos)
+            # relations of others pointing to the removed synset are dangling from now on
+            for source, invr in self.m_invedges[pos].pop(wnid, ()):
+                self.m_dangling[pos].setdefault(wnid, []).append((source, backrel[invr]))
+            self._invalidate(old, pos)
+            cnt["removed"] += 1
+
+        for syns in synsets:
+            try:
+                dat = self.dat(syns.pos)
+            except InvalidPOSException as e:
+                self._warn("W02", "{0} for synset {1}".format(e, syns.wnid))
+                continue
+            pos = syns.pos
+            inverted = []
+            if syns.wnid in dat:
+                old = self._remove_synset(syns.wnid, pos)
+                # inverse relations from others still apply to the new version
+                inverted = self.m_invedges[pos].pop(syns.wnid, [])
+                self._invalidate(old, pos)
+                cnt["changed"] += 1
+            else:
+                cnt["added"] += 1
+            self._save_synset(syns, 0)
+            self._inv_rel_synset(syns, pos)
+            syns.ilrs.extend(inverted)
+            if inverted:
+                self.m_invedges[pos][syns.wnid] = inverted
+            # relations of others that were pointing to the missing synset can be inverted now
+            for source, rel in self.m_dangling[pos].pop(syns.wnid, ()):
+                if source != syns.wnid:
+                    self._add_inverse(syns, (source, self._invRelTable[rel]), pos)
+            self._invalidate(syns, pos)
+        self._count_synsets()
+        return cnt
+
+    # Remove synset from dat, idx, the external id indices, and withdraw its inverse relations.
+    def _remove_synset(self, wnid, pos):
+        old = self.dat(pos)[wnid]
+        self._withdraw_inv_rel_synset(old, pos)
+        del self.dat(pos)[wnid]
+        idx = self.idx(pos)
+        for i in old.synonyms:
+            ids = idx.get(i.literal)
+            if ids and wnid in ids:
+                ids.remove(wnid)
+                if not ids:
+                    del idx[i.literal]
+        self._unindex_external(old)
+        return old
+
+    # Update derived indices and caches after synset was added or removed.
+    def _invalidate(self, syns, pos):
+        wnid = syns.wnid
+        for (attr, p), index in self.m_attridx.items():
+            if p != pos:
+                continue
+            for value in self._attrValues[attr](syns):
+                if wnid in self.dat(pos) and self.dat(pos)[wnid] is syns:
+                    index[value] = index.get(value, frozenset()) | {wnid}
+                elif value in index:
+                    ids = index[value] - {wnid}
+                    if ids:
+                        index[value] = ids
+                    else:
+                        del index[value]
+        for cache in (self.LeaCho_D, self.m_depth, self.m_ic, self.m_lcsidx, self.m_revedges):
+            for key in [key for key in cache if key[0] == pos]:
+                del cache[key]
+        self.m_generation += 1
+
+    # Freeze the object after loading, making it safe to share between threads without locks.
+    # All lazily computed structures are precomputed (attribute indices, Leacock-Chodorow D, depth,
+    # information content tables and LCS indices for the given relations), then the internal structures
+    # are made immutable: maps become read-only mapping proxies, lists (index entries, list members of
+    # synsets) become tuples. No query writes any shared state afterwards, except the expand() cache,
+    # which has its own lock. A frozen object can not be updated (see updateSynsets()), reload it instead.
+    # @param relations relations to precompute Leacock-Chodorow D for (in all POS)
+    def freeze(self, relations=("hypernym",)):
+        if self.m_frozen:
+            return
+        for attr in self._attrValues:
+            for pos in ("n", "v", "a", "b"):
+                self.attridx(attr, pos)
+        for pos in ("n", "v", "a", "b"):
+            for rel in relations:
+                self.getLeaChoD(pos, rel)
+                self.depthTable(pos, rel)
+                self.icTable(pos, rel)
+                self.lcsIndex(pos, rel)
+            self._reverseEdges(pos, "hyponym")
+
+        for pos in ("n", "v", "a", "b"):
+            for syns in self.dat(pos).values():
+                syns.freeze()
+        self.m_ndat = MappingProxyType(self.m_ndat)
+        self.m_vdat = MappingProxyType(self.m_vdat)
+        self.m_adat = MappingProxyType(self.m_adat)
+        self.m_bdat = MappingProxyType(self.m_bdat)
+        self.m_nidx = self._freeze_multimap(self.m_nidx)
+        self.m_vidx = self._freeze_multimap(self.m_vidx)
+        self.m_aidx = self._freeze_multimap(self.m_aidx)
+        self.m_bidx = self._freeze_multimap(self.m_bidx)
+        self.m_id3idx = self._freeze_multimap(self.m_id3idx)
+        self.m_elridx = self._freeze_multimap(self.m_elridx)
+        self.m_elr3idx = self._freeze_multimap(self.m_elr3idx)
+        self.m_ekszidx = self._freeze_multimap(self.m_ekszidx)
+        self.m_invedges = MappingProxyType({pos: self._freeze_multimap(val) for pos, val in self.m_invedges.items()})
+        self.m_dangling = MappingProxyType({pos: self._freeze_multimap(val) for pos, val in self.m_dangling.items()})
+        self.m_attridx = MappingProxyType({key: MappingProxyType(val) for key, val in self.m_attridx.items()})
+        self.LeaCho_D = MappingProxyType(self.LeaCho_D)
+        self.m_depth = MappingProxyType({key: MappingProxyType(val) for key, val in self.m_depth.items()})
+        self.m_ic = MappingProxyType({key: MappingProxyType(val) for key, val in self.m_ic.items()})
+        self.m_freq = MappingProxyType(self.m_freq)
+        self.m_lcsidx = MappingProxyType(self.m_lcsidx)
+        self.m_revedges = MappingProxyType({key: self._freeze_multimap(val) for key, val in self.m_revedges.items()})
+        self.m_frozen = True
+
+    @staticmethod
+    def _freeze_multimap(multimap):
+        return MappingProxyType({key: tuple(val) for key, val in multimap.items()})
 
     # The following functions give access to the internal representation of
     # all the content read from the XML file.
@@ -234,7 +975,81 @@ class WNQuery:
         elif pos == "b":
             return self.m_bidx
         else:
-            raise InvalidPOSException("Invalid POS '{1}'".format(pos))
+            raise InvalidPOSException("Invalid POS '{0}'".format(pos))
+
+    # Get the appropriate external-id-to-local-synsets-multimap.
+    # @param kind which external link to use: id3|elr|elr3|eksz
+    # @exception WNQueryException if invalid kind
+    def extidx(self, kind):
+        if kind == "id3":
+            return self.m_id3idx
+        elif kind == "elr":
+            return self.m_elridx
+        elif kind == "elr3":
+            return self.m_elr3idx
+        elif kind == "eksz":
+            return self.m_ekszidx
+        else:
+            raise WNQueryException("Invalid external link kind '{0}'".format(kind))
+
+    # Synset attributes that can be indexed by attridx() and the values they contribute for a synset
+    _attrValues = {
+        "sumo":   lambda syns: [term for term, _ in syns.sumolinks],
+        "domain": lambda syns: [syns.domain] if syns.domain else [],
+        "bcs":    lambda syns: [syns.bcs] if syns.bcs else [],
+        "stamp":  lambda syns: [syns.stamp] if syns.stamp else [],
+    }
+
+    # Get the attribute-value-to-synset-ids map for the given attribute and POS.
+    # The index is built on first use and kept afterwards.
+    # @param attr attribute to index: sumo|domain|bcs|stamp
+    # @param pos part-of-speech: n|v|a|b
+    # @exception WNQueryException if invalid attribute
+    # @exception InvalidPOSException for invalid POS
+    def attridx(self, attr, pos):
+        key = (attr, pos)
+        if key not in self.m_attridx:
+            if attr not in self._attrValues:
+                raise WNQueryException("Invalid attribute '{0}'".format(attr))
+            values = self._attrValues[attr]
+            index = defaultdict(set)
+            for wnid, syns in self.dat(pos).items():
+                for value in values(syns):
+                    index[value].add(wnid)
+            self.m_attridx[key] = {value: frozenset(ids) for value, ids in index.items()}
+        return self.m_attridx[key]
+
+    # Get ids of synsets in POS having the given attribute value (e.g. SUMO term, domain name).
+    # @param attr attribute to look up: sumo|domain|bcs|stamp
+    # @param value the attribute value
+    # @param pos part-of-speech: n|v|a|b
+    # @return frozenset of synset ids (empty if no synset has this value)
+    # @exception WNQueryException if invalid attribute
+    # @exception InvalidPOSException for invalid POS
+    def lookUpAttribute(self, attr, value, pos):
+        return self.attridx(attr, pos).get(value, frozenset())
+
+    # Select synsets in POS matching a combination of attribute values.
+    # @param pos part-of-speech: n|v|a|b
+    # @param criteria list of (attribute, value) pairs, eg. [("domain", "zoology"), ("sumo", "Animal")]
+    # @param union if false, synsets matching all criteria are returned (intersection), otherwise synsets matching any of them
+    # @return set of synset ids
+    # @exception WNQueryException if invalid attribute
+    # @exception InvalidPOSException for invalid POS
+    def selectSynsets(self, pos, criteria, union=False):
+        # start from the smallest set, so intersections stay cheap
+        sets = sorted((self.lookUpAttribute(attr, value, pos) for attr, value in criteria), key=len)
+        if not sets:
+            return set()
+        res = set(sets[0])
+        for ids in sets[1:]:
+            if union:
+                res |= ids
+            elif res:
+                res &= ids
+            else:
+                break
+        return res
 
     # Get synset with given id.
     # @param id synset id to look up
@@ -292,6 +1107,45 @@ class WNQuery:
             return None
         return self.idx(pos)[literal]
 
+    # Get local synsets linked to an external id (PWN3.0 id, ELR/ELR3 target or EKSz sense id).
+    # @param extid the external id to look up
+    # @param kind which external link to use: id3|elr|elr3|eksz
+    # @param pos if given, only synsets in this POS are returned, otherwise all POS are searched
+    # @return list of Synsets (empty if nothing is linked to extid)
+    # @exception WNQueryException if invalid kind
+    # @exception InvalidPOSException for invalid POS
+    def lookUpExternal(self, extid, kind, pos=None):
+        res = []
+        for wnid, spos in self.extidx(kind).get(extid, ()):
+            if pos is None or spos == pos:
+                res.append(self.dat(spos)[wnid])
+        return res
+
+    # Get local synsets with given PWN3.0 synset id (ID3 tag).
+    def lookUpID3(self, wnid3, pos=None):
+        return self.lookUpExternal(wnid3, "id3", pos)
+
+    # Translate many external ids at once to local synset ids.
+    # @param extids iterable of external ids
+    # @param kind which external link to use: id3|elr|elr3|eksz
+    # @param pos if given, only synsets in this POS are returned, otherwise all POS are searched
+    # @return dict: external id -> list of local synset ids (ids without any local synset are left out)
+    # @exception WNQueryException if invalid kind
+    def translateExternal(self, extids, kind, pos=None):
+        index = self.extidx(kind)
+        res = dict()
+        for extid in extids:
+            entries = index.get(extid)
+            if entries:
+                ids = [wnid for wnid, spos in entries if pos is None or spos == pos]
+                if ids:
+                    res[extid] = ids
+        return res
+
+    # Translate many PWN3.0 synset ids (ID3 tag) at once to local synset ids.
+    def translateID3(self, wnid3s, pos=None):
+        return self.translateExternal(wnid3s, "id3", pos)
+
     # Get synset containing word sense (literal with given sense number) in given POS.
     # @param literal to look up
     # @param sensenum sense number of literal
@@ -360,20 +1214,70 @@ class WNQuery:
         return res
 
     # Like traceRelation, but output goes to output stream with pretty formatting.
+    # See iterTraceRelationOS() for producing the lines one by one.
     def traceRelationOS(self, wnid, pos, rel, lev=0):
-        buf = []
-        # look up current synset
-        if wnid in self.dat(pos):  # found
-            # print current synset
-            current = ["{0}:{1}".format(i.literal, i.sense) for i in self.dat(pos)[wnid].synonyms]
-            buf.append("{0}{1}  {{{2}}}  ({3})".format("  "*lev, self.dat(pos)[wnid].wnid,
-                                            ", ".join(current),
-                                            self.dat(pos)[wnid].definition))
-            # recurse on children
-            for synset_id, relation in self.dat(pos)[wnid].ilrs:  # for all relations of synset
-                if relation == rel:  # if it is the right type
-                    buf.extend(self.traceRelationOS(synset_id, pos, rel, lev+1))  # recurse on target
-        return buf
+        return list(self.iterTraceRelationOS(wnid, pos, rel, lev=lev))
+
+    # Do a preorder trace from the given synset along the given relation, lazily (constant memory besides
+    # the current path). Missing synsets are skipped.
+    # @param maxDepth synsets deeper than this (relative to the starting one) are not visited (None for no limit)
+    # @param maxNodes stop after this many synsets (None for no limit)
+    # @param lev level of the starting synset
+    # @return generator of (synset id, level, flag) triples. flag is None, or "cycle" for a synset already on the
+    # path from the starting synset (it is not expanded again), or "truncated" for the last item (with id None)
+    # if maxNodes was reached and there were more synsets to visit.
+    # @exception InvalidPOSException for invalid POS
+    def iterTraceRelation(self, wnid, pos, rel, maxDepth=None, maxNodes=None, lev=0):
+        dat = self.dat(pos)
+        if wnid not in dat:
+            return
+
+        # counted step by step: the generator may be consumed outside of the query that created it
+        def children(curr):
+            ilrs = dat[curr].ilrs
+            self._countSteps(1, len(ilrs))
+            return iter([target for target, relation in ilrs if relation == rel and target in dat])
+
+        yield wnid, lev, None
+        if maxDepth is not None and maxDepth <= 0:  # start synset only
+            return
+        count = 1
+        path = {wnid}
+        # the stack is never deeper than maxDepth, so children taken from it are never deeper either
+        stack = [(wnid, children(wnid))]
+        while stack:
+            curr, it = stack[-1]
+            child = next(it, None)
+            if child is None:
+                stack.pop()
+                path.discard(curr)
+                continue
+            depth = len(stack)
+            if maxNodes is not None and count >= maxNodes:
+                yield None, lev + depth, "truncated"
+                return
+            count += 1
+            if child in path:
+                yield child, lev + depth, "cycle"
+                continue
+            yield child, lev + depth, None
+            if maxDepth is None or depth < maxDepth:
+                path.add(child)
+                stack.append((child, children(child)))
+
+    # Like iterTraceRelation(), but produce the pretty formatted lines of traceRelationOS().
+    # Cycles and truncation are marked with [cycle] and [truncated].
+    def iterTraceRelationOS(self, wnid, pos, rel, maxDepth=None, maxNodes=None, lev=0):
+        dat = self.dat(pos)
+        for synset_id, level, flag in self.iterTraceRelation(wnid, pos, rel, maxDepth, maxNodes, lev):
+            if flag == "truncated":
+                yield "{0}... [truncated]".format("  "*level)
+            elif flag == "cycle":
+                yield "{0}{1}  [cycle]".format("  "*level, synset_id)
+            else:
+                syns = dat[synset_id]
+                current = ["{0}:{1}".format(i.literal, i.sense) for i in syns.synonyms]
+                yield "{0}{1}  {{{2}}}  ({3})".format("  "*level, syns.wnid, ", ".join(current), syns.definition)
 
     # Calculate the longest possible path to synset from the root level using relation
     # @param id id of synset to start from
@@ -410,6 +1314,122 @@ class WNQuery:
             res = res.union(self.trace_rel_recS(i, pos, rel))  # recurse on target
         return res
 
+    # Collect the neighbourhood of synsets along several relations in one breadth first search.
+    # Every path follows a single relation (eg. hypernyms up to 2 levels, all meronyms), the starting synsets
+    # are at distance 0. A synset is reported once, at its smallest distance (ties: first relation in order).
+    # @param wnids id of synset to start from, or list of ids
+    # @param pos POS of search
+    # @param relations dict: relation name -> maximum number of hops (None for unlimited), or list of relation names
+    # (all unlimited)
+    # @param maxResults stop when this many synsets (including the starting ones) are found
+    # @param until if given, function (id, distance, relation) -> bool; the search stops after the first synset
+    # for which it returns true
+    # @return list of (synset id, distance, relation it was reached by, None for starting synsets), in order of distance
+    # @exception InvalidPOSException for invalid POS
+    def lookUpNeighbourhood(self, wnids, pos, relations, maxResults=None, until=None):
+        dat = self.dat(pos)
+        if isinstance(wnids, str):
+            wnids = [wnids]
+        if not isinstance(relations, dict):
+            relations = dict.fromkeys(relations)
+        res = []
+        found = set()
+        visited = set()  # (synset id, relation) pairs already expanded
+        frontier = []
+
+        def report(wnid, dist, rel):
+            found.add(wnid)
+            res.append((wnid, dist, rel))
+            return (maxResults is not None and len(res) >= maxResults) or (until is not None and until(wnid, dist, rel))
+
+        for wnid in wnids:
+            if wnid in dat and wnid not in found:
+                if report(wnid, 0, None):
+                    return res
+                for rel in relations:
+                    frontier.append((wnid, rel))
+                    visited.add((wnid, rel))
+        dist = 0
+        nodes = edges = 0
+        try:
+            while frontier:
+                dist += 1
+                nxt = []
+                for curr, rel in frontier:
+                    limit = relations[rel]
+                    if limit is not None and dist > limit:
+                        continue
+                    ilrs = dat[curr].ilrs
+                    nodes += 1
+                    edges += len(ilrs)
+                    for target, r in ilrs:
+                        if r != rel or target not in dat or (target, rel) in visited:
+                            continue
+                        visited.add((target, rel))
+                        nxt.append((target, rel))
+                        if target not in found and report(target, dist, rel):
+                            return res
+                frontier = nxt
+            return res
+        finally:
+            self._countSteps(nodes, edges)
+
+    # Maximum number of entries in the cache of expand()
+    expandCacheSize = 10000
+
+    # Expand a literal for search indexing: the literals of its senses and of synsets near them.
+    # @param literal literal to expand
+    # @param pos POS of literal
+    # @param spec dict: relation name -> number of levels (None for unlimited), eg. {"hyponym": 2, "hypernym": 1};
+    # None or empty for synonyms only (see lookUpNeighbourhood())
+    # @param weights if given (a float between 0 and 1), literals are weighted by weights ** distance
+    # @return tuple of literals (starting with the literal itself, synonyms first, then by distance), without
+    # duplicates; with weights tuple of (literal, weight) pairs. Unknown literals give an empty tuple.
+    # Results are cached (the last expandCacheSize ones), the cache is dropped when the object is updated.
+    # @exception InvalidPOSException for invalid POS
+    def expand(self, literal, pos, spec=None, weights=None):
+        key = (literal, pos, tuple(sorted(spec.items())) if spec else (), weights)
+        with self.m_explock:
+            if self.m_expcachegen != self.m_generation:
+                self.m_expcache.clear()
+                self.m_expcachegen = self.m_generation
+            res = self.m_expcache.get(key)
+            self._countCache(res is not None)
+            if res is not None:
+                self.m_expcache.move_to_end(key)
+                return res
+        res = self._expand(literal, pos, spec, weights, dict())
+        with self.m_explock:
+            self.m_expcache[key] = res
+            while len(self.m_expcache) > self.expandCacheSize:
+                self.m_expcache.popitem(last=False)
+        return res
+
+    # Expand many literals at once (see expand()). Neighbourhoods of synsets shared by several literals are
+    # computed only once, and the cache of expand() is not used (so a whole vocabulary does not flush it).
+    # @return dict: literal -> expansion
+    # @exception InvalidPOSException for invalid POS
+    def expandBulk(self, literals, pos, spec=None, weights=None):
+        memo = dict()
+        return {literal: self._expand(literal, pos, spec, weights, memo) for literal in literals}
+
+    # memo: synset id -> neighbourhood of synset (see lookUpNeighbourhood())
+    def _expand(self, literal, pos, spec, weights, memo):
+        dat = self.dat(pos)
+        dist = {literal: 0} if literal in self.idx(pos) else dict()
+        for wnid in self.idx(pos).get(literal, ()):
+            if wnid not in memo:
+                memo[wnid] = self.lookUpNeighbourhood(wnid, pos, spec or ())
+            for target, d, _ in memo[wnid]:
+                for i in dat[target].synonyms:
+                    if i.literal not in dist or d < dist[i.literal]:
+                        dist[i.literal] = d
+        # stable sort: literals of the same distance keep the order they were found in
+        res = sorted(dist, key=dist.get)
+        if weights is None:
+            return tuple(res)
+        return tuple((i, weights ** dist[i]) for i in res)
+
     # Check if synset is connected with any of the given synsets on paths defined by relation starting from synset.
     def isIDConnectedWith(self, wnid, pos, rel, targ_ids):
         # check if current synset is any of the searched ids
@@ -434,19 +1454,92 @@ class WNQuery:
         return None, None
 
     # Check if literal is in synset, or, if hyponyms is true, is in one of synset's hyponyms (recursive)
+    # Instead of walking the hyponym subtree of the synset, the senses of the literal are checked for having
+    # the synset among their hypernym ancestors (hyponyms being the inverses of hypernyms, see invert_relations()),
+    # by the LCS index (see lcsIndex()) when available. Hyponym relations read from the file are not inverted to
+    # hypernyms, so in a POS having such relations the ancestors are searched along both (see _reverseEdges()).
     def isLiteralCompatibleWithSynset(self, literal, pos, wnid, hyponyms):
-        # check if synset contains literal
-        syns = self.lookUpID(wnid, pos)
-        if syns:
-            for i in syns.synonyms:
-                if i.literal == literal:
-                    return True
-            # if allowed, recurse on hyponyms
-            if hyponyms:
-                for synset_id, rel in syns.ilrs:
-                    if rel == "hyponym" and self.isLiteralCompatibleWithSynset(literal, pos, synset_id, True):
-                        return True
-        return False
+        return self.literalsCompatibleWithSynset([literal], pos, wnid, hyponyms)[literal]
+
+    # Check many literals against one synset (see isLiteralCompatibleWithSynset()).
+    # @return dict: literal -> true if compatible
+    # @exception InvalidPOSException for invalid POS
+    def literalsCompatibleWithSynset(self, literals, pos, wnid, hyponyms):
+        res = dict.fromkeys(literals, False)
+        if wnid not in self.dat(pos):
+            return res
+        idx = self.idx(pos)
+        index = None
+        hypoparents = None
+        if hyponyms:
+            hypoparents = self._reverseEdges(pos, "hyponym")
+            # the index is not built for a frozen object (it would be thrown away after the call)
+            index = self.m_lcsidx.get((pos, "hypernym"))
+            if index is None and not self.m_frozen and not hypoparents:
+                index = self.lcsIndex(pos, "hypernym")
+        reach = dict()
+        for literal in res:
+            for sense in idx.get(literal, ()):
+                if sense == wnid:
+                    res[literal] = True
+                elif not hyponyms:
+                    continue
+                elif hypoparents:
+                    if sense not in reach:
+                        reach[sense] = self._hypernymAncestors(sense, pos, hypoparents)
+                    res[literal] = wnid in reach[sense]
+                elif index is not None:
+                    res[literal] = index.isAncestor(sense, wnid, reach)
+                else:
+                    if sense not in reach:
+                        reach[sense] = self._ancestorDistances(sense, pos, "hypernym")
+                    res[literal] = wnid in reach[sense][0]
+                if res[literal]:
+                    break
+        return res
+
+    # Get the sources of the original (read from the file, not added by inversion, see invert_relations())
+    # relations pointing to each synset of POS. The table is computed on first use and kept afterwards.
+    # @return dict: synset id -> list of ids of synsets having relation to it (empty if there is no such relation)
+    def _reverseEdges(self, pos, relation):
+        key = (pos, relation)
+        if key in self.m_revedges:
+            return self.m_revedges[key]
+        dat = self.dat(pos)
+        invedges = self.m_invedges[pos]
+        rev = dict()
+        for wnid, syns in dat.items():
+            inverted = Counter(edge for edge in invedges.get(wnid, ()) if edge[1] == relation)
+            for edge in syns.ilrs:
+                if edge[1] != relation or edge[0] not in dat:
+                    continue
+                if inverted[edge] > 0:
+                    inverted[edge] -= 1
+                else:
+                    rev.setdefault(edge[0], []).append(wnid)
+        if not self.m_frozen:
+            self.m_revedges[key] = rev
+        return rev
+
+    # Get the hypernym ancestors of synset (including itself), also going up along original hyponym relations.
+    # @param hypoparents table of original hyponym relations, see _reverseEdges()
+    def _hypernymAncestors(self, wnid, pos, hypoparents):
+        dat = self.dat(pos)
+        seen = {wnid}
+        stack = [wnid]
+        edges = 0
+        while stack:
+            curr = stack.pop()
+            ilrs = dat[curr].ilrs
+            edges += len(ilrs)
+            parents = [target for target, rel in ilrs if rel == "hypernym"]
+            parents.extend(hypoparents.get(curr, ()))
+            for target in parents:
+                if target not in seen and target in dat:
+                    seen.add(target)
+                    stack.append(target)
+        self._countSteps(len(seen), edges)
+        return seen
 
     # Determine if two literals are synonyms in a PoS, also return id of a synset that contains both.
     # @param literal1 first word to be checked
@@ -498,31 +1591,22 @@ class WNQuery:
 
     def simLeaCho(self, wnid1, wnid2, pos, relation, addArtificialTop):
         d = self.getLeaChoD(pos, relation)
-        # get nodes reachable from wnid1, wnid2 by relation + their distances (starting with wnid1/2 with dist. 1)
-        # find common node (O(n*m))
-        ci_r1 = None
-        ci_r2 = None
-        path_length = 2*d
-        for key1, val1 in self.getReach(wnid1, pos, relation, addArtificialTop):
-            for key2, val2 in self.getReach(wnid2, pos, relation, addArtificialTop):
-                if key1 == key2:
-                    if val1 + val2 < path_length:
-                        ci_r1 = (key1, val1)
-                        ci_r2 = (key2, val2)
-                        path_length = val1 + val2
-
-        path_length = path_length - 1 # because the common node was counted twice
+        # find common node with the shortest connecting path (see lcsIndex())
+        lcs, d1, d2 = self.lcsIndex(pos, relation).query(wnid1, wnid2, addArtificialTop)
 
         # return similarity score
-        if ci_r1 and ci_r2:  # based on length of shortest connecting path
+        if lcs is not None and d1 + d2 + 2 < 2 * d:  # based on length of shortest connecting path
+            path_length = d1 + d2 + 1  # nodes on the path, the common node counted once
             return -1.0 * math.log10(float(path_length) / (2.0 * d))
         else:  # when no connecting path exists between synsets
             return self.LeaCho_noconnect
 
     def getLeaChoD(self, pos, relation):
         if (pos, relation) not in self.LeaCho_D:
-            self.LeaCho_D[(pos, relation)] =\
-                max(self.getMaxDepth(wnid, pos, relation) for wnid in self.m_ndat)
+            d = max(self.getMaxDepth(wnid, pos, relation) for wnid in self.m_ndat)
+            if self.m_frozen:  # not precomputed by freeze(), the cache can not be written
+                return d
+            self.LeaCho_D[(pos, relation)] = d
 
         return self.LeaCho_D[(pos, relation)]
 
@@ -543,3 +1627,271 @@ class WNQuery:
             if not haschildren and addTop:
                 res.append(("#TOP#", dist))
         return res
+
+    # Get the distances of all synsets reachable from synset by relation (breadth first, cycle safe).
+    # Missing synsets are skipped, like in getReach().
+    # @return (distances, topdist): dict synset id -> length of shortest path (0 for the synset itself),
+    # and the distance of the artificial root (#TOP#, see getReach()), ie. 1 + the distance of the nearest
+    # synset without relation, or None if there is no such synset
+    def _ancestorDistances(self, wnid, pos, relation):
+        dat = self.dat(pos)
+        if wnid not in dat:
+            return dict(), None
+        dist = {wnid: 0}
+        topdist = None
+        frontier = [wnid]
+        d = 0
+        edges = 0
+        while frontier:
+            d += 1
+            nxt = []
+            for curr in frontier:
+                haschildren = False
+                ilrs = dat[curr].ilrs
+                edges += len(ilrs)
+                for target, rel in ilrs:
+                    if rel == relation:
+                        haschildren = True
+                        if target not in dist and target in dat:
+                            dist[target] = d
+                            nxt.append(target)
+                if not haschildren and topdist is None:
+                    topdist = d
+            frontier = nxt
+        self._countSteps(len(dist), edges)
+        return dist, topdist
+
+    # Find the lowest common subsumer of two synsets: the synset reachable from both by relation
+    # with the shortest connecting path (ties are broken by greater depth, then by id).
+    # @param addArtificialTop if true, the artificial root (#TOP#) above all synsets without relation is also
+    # a candidate (see similarityLeacockChodorow()), it is chosen if no common synset is nearer
+    # @return (lcs id, distance from wnid1, distance from wnid2), or (None, None, None) if not connected
+    # @exception InvalidPOSException for invalid POS
+    def lowestCommonSubsumer(self, wnid1, wnid2, pos, relation="hypernym", addArtificialTop=False):
+        return self.lcsIndex(pos, relation).query(wnid1, wnid2, addArtificialTop)
+
+    # Get the LCS index (see LCSIndex) of the hierarchy defined by relation.
+    # The index is built on first use and kept afterwards (until the POS is updated).
+    # @exception InvalidPOSException for invalid POS
+    def lcsIndex(self, pos, relation):
+        key = (pos, relation)
+        self._countCache(key in self.m_lcsidx)
+        if key in self.m_lcsidx:
+            return self.m_lcsidx[key]
+        index = LCSIndex(self, pos, relation)
+        if not self.m_frozen:
+            self.m_lcsidx[key] = index
+        return index
+
+    def _lcs(self, reach1, reach2, pos, relation, addTop):
+        (dist1, top1), (dist2, top2) = reach1, reach2
+        if len(dist1) > len(dist2):
+            dist1, dist2 = dist2, dist1
+            swapped = True
+        else:
+            swapped = False
+        depth = self.depthTable(pos, relation)
+        best = None
+        for wnid, d1 in dist1.items():
+            d2 = dist2.get(wnid)
+            if d2 is not None:
+                key = (d1 + d2, -depth.get(wnid, 0), wnid)
+                if best is None or key < best[0]:
+                    best = (key, wnid, d1, d2)
+        if addTop and top1 is not None and top2 is not None and (best is None or top1 + top2 < best[0][0]):
+            return "#TOP#", top1, top2
+        if best is not None:
+            _, wnid, d1, d2 = best
+            return (wnid, d2, d1) if swapped else (wnid, d1, d2)
+        return None, None, None
+
+    # Get the depth of every synset in the hierarchy defined by relation (eg. hypernym):
+    # 1 for synsets without relation (roots), 2 for their direct descendants, etc.
+    # If there are several routes to the root level, the shortest one is used.
+    # The table is computed on first use and kept afterwards.
+    # @exception InvalidPOSException for invalid POS
+    def depthTable(self, pos, relation):
+        key = (pos, relation)
+        self._countCache(key in self.m_depth)
+        if key in self.m_depth:
+            return self.m_depth[key]
+        dat = self.dat(pos)
+        children = defaultdict(list)
+        roots = []
+        edges = 0
+        for wnid, syns in dat.items():
+            edges += len(syns.ilrs)
+            haschildren = False
+            for target, rel in syns.ilrs:
+                if rel == relation:
+                    haschildren = True
+                    children[target].append(wnid)
+            if not haschildren:
+                roots.append(wnid)
+        depth = {wnid: 1 for wnid in roots}
+        frontier = roots
+        d = 1
+        while frontier:
+            d += 1
+            nxt = []
+            for curr in frontier:
+                for child in children.get(curr, ()):
+                    if child not in depth:
+                        depth[child] = d
+                        nxt.append(child)
+            frontier = nxt
+        # synsets only on cycles are not reachable from any root
+        for wnid in dat:
+            depth.setdefault(wnid, 1)
+        self._countSteps(len(dat), edges)
+        if not self.m_frozen:
+            self.m_depth[key] = depth
+        return depth
+
+    # Load synset frequencies for computing information content (see icTable()).
+    # Each line of the file holds a key and a count separated by a tab. Keys that are synset ids in POS count
+    # for that synset, other keys are taken as literals, and their count is divided among their senses.
+    # @param filename name of frequency file (UTF-8)
+    # @param pos POS of synsets/literals in file
+    # @return number of lines used
+    # @exception WNQueryException if the file could not be opened, a count is not a number or the object is frozen
+    # @exception InvalidPOSException for invalid POS
+    def loadFrequencies(self, filename, pos):
+        if self.m_frozen:
+            raise WNQueryException("WNQuery object is frozen, it can not be updated")
+        dat = self.dat(pos)
+        idx = self.idx(pos)
+        freq = defaultdict(float)
+        cnt = 0
+        try:
+            fh = open(filename, "r", encoding="UTF-8")
+        except (OSError, IOError) as e:
+            raise WNQueryException("Could not open file: {0} because: {1}".format(filename, e))
+        with fh:
+            for lineno, line in enumerate(fh, 1):
+                fields = line.rstrip("\n").split("\t")
+                if len(fields) != 2:
+                    continue
+                try:
+                    key, count = fields[0], float(fields[1])
+                except ValueError:
+                    raise WNQueryException("Invalid count in file: {0} line {1}: {2}".format(
+                        filename, lineno, fields[1]))
+                if key in dat:
+                    freq[key] += count
+                elif key in idx:
+                    for wnid in idx[key]:
+                        freq[wnid] += count / len(idx[key])
+                else:
+                    continue
+                cnt += 1
+        self.m_freq[pos] = dict(freq)
+        for key in [key for key in self.m_ic if key[0] == pos]:
+            del self.m_ic[key]
+        return cnt
+
+    # Get the information content of every synset in the hierarchy defined by relation:
+    # IC(s) = -log(p(s)), where p(s) is the frequency of s and its (distant) descendants divided by the total.
+    # Frequencies are loaded by loadFrequencies() (with add-one smoothing), otherwise every synset counts 1,
+    # so IC is computed from subtree sizes. The table is computed on first use and kept afterwards.
+    # @exception InvalidPOSException for invalid POS
+    def icTable(self, pos, relation):
+        key = (pos, relation)
+        self._countCache(key in self.m_ic)
+        if key in self.m_ic:
+            return self.m_ic[key]
+        dat = self.dat(pos)
+        counts = self.m_freq.get(pos)
+        freq = defaultdict(float)
+        total = 0.0
+        for wnid in dat:
+            c = counts.get(wnid, 0.0) + 1.0 if counts is not None else 1.0
+            total += c
+            # add count to the synset and all of its ancestors (each only once)
+            for anc in self._ancestorDistances(wnid, pos, relation)[0]:
+                freq[anc] += c
+        ic = {wnid: -math.log(freq[wnid] / total) for wnid in dat}
+        if not self.m_frozen:
+            self.m_ic[key] = ic
+        return ic
+
+    # Similarity measures of synsetSimilarity(), computed from the LCS search result and the tables.
+    # Arguments: lcs, d1, d2, wnid1, wnid2, depth table, IC table
+    @staticmethod
+    def _simWuPalmer(lcs, d1, d2, wnid1, wnid2, depth, ic):
+        dl = depth.get(lcs, 0)
+        return 2.0 * dl / (d1 + d2 + 2.0 * dl) if dl else 0.0
+
+    @staticmethod
+    def _simResnik(lcs, d1, d2, wnid1, wnid2, depth, ic):
+        return ic.get(lcs, 0.0)
+
+    @staticmethod
+    def _simLin(lcs, d1, d2, wnid1, wnid2, depth, ic):
+        if wnid1 == wnid2:  # also for IC 0 (eg. roots)
+            return 1.0
+        denom = ic.get(wnid1, 0.0) + ic.get(wnid2, 0.0)
+        return 2.0 * ic.get(lcs, 0.0) / denom if denom else 0.0
+
+    @staticmethod
+    def _simJiangConrath(lcs, d1, d2, wnid1, wnid2, depth, ic):
+        dist = ic.get(wnid1, 0.0) + ic.get(wnid2, 0.0) - 2.0 * ic.get(lcs, 0.0)
+        return min(1.0 / dist, WNQuery.maxJiangConrath) if dist > 0.0 else WNQuery.maxJiangConrath
+
+    _simMeasures = {"wup": _simWuPalmer.__func__, "res": _simResnik.__func__,
+                    "lin": _simLin.__func__, "jcn": _simJiangConrath.__func__}
+
+    # Jiang-Conrath score of synsets at IC distance 0 (eg. identical synsets), instead of infinity
+    maxJiangConrath = 1e300
+
+    # Calculate the similarity of two synsets.
+    # @param measure wup (Wu-Palmer), res (Resnik), lin (Lin) or jcn (Jiang-Conrath)
+    # Wu-Palmer uses depthTable(), the others use icTable(); the lowest common subsumer is found by
+    # lowestCommonSubsumer(). If the synsets are not connected (or only through #TOP#), the score is 0.
+    # Lin gives 1 for identical synsets, Jiang-Conrath at most maxJiangConrath.
+    # @exception WNQueryException for invalid measure
+    # @exception InvalidPOSException for invalid POS
+    def synsetSimilarity(self, wnid1, wnid2, pos, relation, measure, addArtificialTop=False):
+        return self.similarityBatch([(wnid1, wnid2)], pos, relation, measure, addArtificialTop)[0]
+
+    def simWuPalmer(self, wnid1, wnid2, pos, relation="hypernym"):
+        return self.synsetSimilarity(wnid1, wnid2, pos, relation, "wup")
+
+    def simResnik(self, wnid1, wnid2, pos, relation="hypernym"):
+        return self.synsetSimilarity(wnid1, wnid2, pos, relation, "res")
+
+    def simLin(self, wnid1, wnid2, pos, relation="hypernym"):
+        return self.synsetSimilarity(wnid1, wnid2, pos, relation, "lin")
+
+    def simJiangConrath(self, wnid1, wnid2, pos, relation="hypernym"):
+        return self.synsetSimilarity(wnid1, wnid2, pos, relation, "jcn")
+
+    # Calculate the similarity of many synset pairs. Every pair costs one LCS index query (see lcsIndex())
+    # plus table lookups; where the index falls back to search, the reachable synsets of each distinct
+    # synset are computed only once.
+    # @param pairs list of (synset id, synset id) pairs
+    # @return list of scores in the order of pairs (see synsetSimilarity())
+    # @exception WNQueryException for invalid measure
+    # @exception InvalidPOSException for invalid POS
+    def similarityBatch(self, pairs, pos, relation, measure, addArtificialTop=False):
+        if measure not in self._simMeasures:
+            raise WNQueryException("Invalid similarity measure '{0}'".format(measure))
+        func = self._simMeasures[measure]
+        depth = self.depthTable(pos, relation)
+        ic = self.icTable(pos, relation) if measure != "wup" else None
+        index = self.lcsIndex(pos, relation)
+        reach = dict()
+        res = []
+        for wnid1, wnid2 in pairs:
+            lcs, d1, d2 = index.query(wnid1, wnid2, addArtificialTop, reach)
+            # synsets connected only through the artificial root score 0 (see synsetSimilarity())
+            res.append(func(lcs, d1, d2, wnid1, wnid2, depth, ic) if lcs is not None and lcs != "#TOP#" else 0.0)
+        return res
+
+    # Calculate a similarity measure for all senses of two literals (like similarityLeacockChodorow()).
+    # @return dict: score -> (id of sense of literal1, id of sense of literal2)
+    # @exception WNQueryException for invalid measure
+    # @exception InvalidPOSException for invalid POS
+    def similarity(self, literal1, literal2, pos, relation, measure, addArtificialTop=False):
+        pairs = [(i.wnid, j.wnid) for i in self.lookUpLiteral(literal1, pos) for j in self.lookUpLiteral(literal2, pos)]
+        return dict(zip(self.similarityBatch(pairs, pos, relation, measure, addArtificialTop), pairs))
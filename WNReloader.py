@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8, vim: expandtab:ts=4 -*-
+
+import os
+import sys
+import time
+import threading
+
+import WNQuery
+import WNExport
+
+# Hot-reloading holder of a WNQuery object.
+# The source (a VisDic XML file, or a directory written by WNExport.exportColumnar) is polled for changes
+# by its modification time. On change a new WNQuery is built in a background thread and swapped in atomically:
+# callers always get a complete object from wn(), and queries in flight keep using the object they got.
+#
+# Usage:
+#   rl = WNReloader("huwn.xml", interval=10.0)
+#   rl.start()
+#   ...
+#   wn = rl.wn()   # take the current instance for one request
+#   wn.lookUpLiteral("kutya", "n")
+class WNReloader:
+    # Constructor. Load the source once (synchronously).
+    # @param source file name of VisDic XML file, or directory of columnar tables
+    # @param log file handle for writing loading warnings to
+    # @param interval seconds between checks of the source when started
+    # @param loader if given, function (source, log) -> WNQuery used instead of the default loading
+    # @param on_reload if given, function called with the stats dict (see stats()) after every successful reload
+    # @exception WNQueryException thrown if initial loading fails
+    def __init__(self, source, log=sys.stderr, interval=5.0, loader=None, on_reload=None):
+        self.m_source = source
+        self.log = log
+        self.m_interval = interval
+        self.m_loader = loader if loader is not None else self._load
+        self.m_on_reload = on_reload
+        self.m_lock = threading.Lock()   # serializes reloads, never taken on the read path
+        self.m_stop = threading.Event()
+        self.m_thread = None
+        self.m_stats = {"reloads": 0, "failures": 0}
+        self.m_mtime = self._mtime()
+        self.m_wn = self.m_loader(source, log)
+
+    # Get the current WNQuery object. Keep the returned reference for the duration of a request.
+    def wn(self):
+        return self.m_wn
+
+    # Get statistics about the last reload: duration (seconds), rss_before and rss_new (bytes of resident memory
+    # before loading and after loading, when both the old and the new object are alive, ie. the peak of a reload),
+    # growth (rss_new - rss_before: the memory taken by the new object next to the old one; None if unknown),
+    # and the total number of reloads and failures.
+    def stats(self):
+        return dict(self.m_stats)
+
+    # Default loader: columnar import for directories, XML parsing otherwise
+    @staticmethod
+    def _load(source, log):
+        if os.path.isdir(source):
+            return WNExport.importColumnar(source, log=log)
+        return WNQuery.WNQuery(source, log)
+
+    # Modification time of the source (latest file for directories), None if it does not exist
+    def _mtime(self):
+        try:
+            if os.path.isdir(self.m_source):
+                return max((os.path.getmtime(os.path.join(self.m_source, name)) for name in os.listdir(self.m_source)),
+                           default=None)
+            return os.path.getmtime(self.m_source)
+        except OSError:
+            return None
+
+    # Current resident memory in bytes (Linux only, None elsewhere)
+    @staticmethod
+    def _rss():
+        try:
+            with open("/proc/self/statm") as fh:
+                return int(fh.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        except (OSError, ValueError, IndexError, AttributeError):
+            return None
+
+    # Check the source once and reload if it has changed.
+    # @return true if a reload happened
+    def check(self):
+        mtime = self._mtime()
+        if mtime is None or mtime == self.m_mtime:
+            return False
+        return self.reload()
+
+    # Build a new WNQuery from the source and swap it in. On failure the old object is kept.
+    # @return true on success
+    def reload(self):
+        with self.m_lock:
+            mtime = self._mtime()
+            rss_before = self._rss()
+            t0 = time.perf_counter()
+            try:
+                new_wn = self.m_loader(self.m_source, self.log)
+            except Exception as e:
+                self.m_stats["failures"] += 1
+                print("Reloading {0} failed: {1}".format(self.m_source, e), file=self.log)
+                # do not retry until the source changes again
+                self.m_mtime = mtime
+                return False
+            duration = time.perf_counter() - t0
+            rss_new = self._rss()
+            self.m_wn = new_wn  # atomic swap, the old object is freed when its last user drops it
+            self.m_mtime = mtime
+            self.m_stats.update(duration=duration, rss_before=rss_before, rss_new=rss_new,
+                                growth=rss_new - rss_before if rss_new is not None and rss_before is not None else None)
+            self.m_stats["reloads"] += 1
+            stats = dict(self.m_stats)
+        print("Reloaded {0} in {1:.2f} s".format(self.m_source, duration), file=self.log)
+        if self.m_on_reload is not None:
+            self.m_on_reload(stats)
+        return True
+
+    # Start watching the source in a background (daemon) thread.
+    def start(self):
+        if self.m_thread is not None:
+            return
+        self.m_stop.clear()
+        self.m_thread = threading.Thread(target=self._watch, name="WNReloader", daemon=True)
+        self.m_thread.start()
+
+    # Stop watching the source (waits for a reload in progress to finish).
+    def stop(self):
+        if self.m_thread is None:
+            return
+        self.m_stop.set()
+        self.m_thread.join()
+        self.m_thread = None
+
+    def _watch(self):
+        while not self.m_stop.wait(self.m_interval):
+            self.check()
@@ -3,6 +3,8 @@
 
 import sys
 import xml.sax
+import xml.sax.expatreader
+from collections import Counter
 
 import synset
 
@@ -14,6 +16,39 @@ class WNXMLParserException(Exception):
     def __str__(self):
         return repr(self.message)
 
+# Synset fields, by the tags (children of SYNSET) holding them. ID and POS are always kept.
+_TAG_FIELDS = {"ID3": "wnid3", "SYNONYM": "synonyms", "DEF": "definition", "BCS": "bcs", "USAGE": "usages",
+               "SNOTE": "snotes", "STAMP": "stamp", "DOMAIN": "domain", "NL": "nl", "TNL": "tnl", "ILR": "ilrs",
+               "SUMO": "sumolinks", "EQ_NEAR_SYNONYM": "elrs", "EQ_HYPERNYM": "elrs", "EQ_HYPONYM": "elrs",
+               "ELR": "elrs", "ELR3": "elrs3", "EKSZ": "ekszlinks", "VFRAME": "vframelinks"}
+# Fields that can be selected for projection (see WNXMLParserContentHandler)
+FIELDS = frozenset(_TAG_FIELDS.values())
+# List fields that are never appended to after loading (ilrs and synonyms are, by relation inversion and updates)
+_SHARED_EMPTY = frozenset(("usages", "snotes", "sumolinks", "elrs", "elrs3", "ekszlinks", "vframelinks"))
+
+# Check a field projection: None (keep all fields), or an iterable of field names (see FIELDS)
+# @return frozenset of field names, or None
+def _checkFields(fields):
+    if fields is None:
+        return None
+    fields = frozenset(fields)
+    if not fields <= FIELDS:
+        raise WNXMLParserException("Unknown synset field(s): {0}".format(", ".join(sorted(fields - FIELDS))))
+    return fields
+
+# Drop the fields of synset not in fields (None keeps all). Dropped string fields become empty,
+# dropped lists become empty tuples (shared) or empty lists.
+# @exception WNXMLParserException for unknown field names
+def projectSynset(syns, fields):
+    fields = _checkFields(fields)
+    if fields is not None:
+        for field in FIELDS - fields:
+            if isinstance(getattr(syns, field), str):
+                setattr(syns, field, "")
+            else:
+                setattr(syns, field, () if field in _SHARED_EMPTY else [])
+    return syns
+
 class WNXMLParserErrorHandler(xml.sax.ErrorHandler):
     def warning(self, msg):
         print("SAX parser warning: {0}".format(msg), file=sys.stderr)
@@ -25,8 +60,16 @@ class WNXMLParserErrorHandler(xml.sax.ErrorHandler):
         raise WNXMLParserException("SAX parser fatal error: {0}".format(msg))
 
 class WNXMLParserContentHandler(xml.sax.ContentHandler):
-    def __init__(self):
+    # @param fields if given, only these synset fields are read (see FIELDS, ID and POS are always read),
+    # the subtrees of the others are skipped, and they are left empty in the synsets (see projectSynset())
+    # @exception WNXMLParserException for unknown field names
+    def __init__(self, fields=None):
         xml.sax.ContentHandler.__init__(self)
+        self.m_fields = _checkFields(fields)
+        # tags under SYNSET to skip (with their subtrees)
+        self.m_skiptags = frozenset(tag for tag, field in _TAG_FIELDS.items()
+                                    if self.m_fields is not None and field not in self.m_fields)
+        self.m_skip = 0                # depth inside a skipped subtree (0: not skipping)
         self.m_lcnt = 0                # input line number
         self.m_ppath = []              # contains the XML path to the current node (names of the ancestors)
         self.m_done = -1               # -1: not started synset yet, 0: inside synset, 1: done with synset
@@ -60,6 +103,13 @@ class WNXMLParserContentHandler(xml.sax.ContentHandler):
             raise WNXMLParserException("Warning: end of file reached before </SYNSET>, possibly corrupt input")
 
     def startElement(self, name, attrs):
+        if self.m_skip:
+            self.m_skip += 1
+            return
+        if name in self.m_skiptags and self.m_ppath and self.m_ppath[-1] == "SYNSET":
+            self.m_skip = 1
+            return
+
         if DEBUG:
             print("({0}, {1}): /{2}/START: {3}".format(self._locator.getLineNumber(),
                                                         self._locator.getColumnNumber(),
@@ -140,6 +190,9 @@ class WNXMLParserContentHandler(xml.sax.ContentHandler):
             self.m_syns.vframelinks.append(["", ""])
 
     def characters(self, chrs):
+        if self.m_skip:
+            return
+
         if DEBUG:
             print("({0}, {1}): /{2}/#PCDATA: {3}".format(self._locator.getLineNumber(),
                                                         self._locator.getColumnNumber(),
@@ -271,6 +324,10 @@ class WNXMLParserContentHandler(xml.sax.ContentHandler):
         self.m_ppath.pop()
 
     def endElement(self, name):
+        if self.m_skip:
+            self.m_skip -= 1
+            return
+
         if DEBUG:
             print("({0}, {1}): /{2}/END: {3}".format(self._locator.getLineNumber(),
                                                         self._locator.getColumnNumber(),
@@ -289,6 +346,8 @@ class WNXMLParserContentHandler(xml.sax.ContentHandler):
             if self.m_done != 0:
                 raise WNXMLParserException("This is impossible!\nThe parser should've caught this error: 'SYNSET' end tag without previous begin tag")
             self.m_done = 1
+            if self.m_fields is not None:
+                projectSynset(self.m_syns, self.m_fields)
             self.m_syns_list.append((self.m_syns, self.m_lcnt))
             self.m_syns = synset.Synset()
 
@@ -338,3 +397,52 @@ class WNXMLParserContentHandler(xml.sax.ContentHandler):
         # Return the gathered result
         return self.m_syns_list
 
+    # Streaming version of parse(): yield (synset, line number) pairs as they are read,
+    # feeding the parser bufsize characters at a time, so memory use does not depend on the input size.
+    def iterparse(self, input_file, bufsize=1 << 16):
+        xmlReader = xml.sax.make_parser()
+        xmlReader.setContentHandler(self)
+        xmlReader.setErrorHandler(WNXMLParserErrorHandler())
+        # parse() would set the locator, feed() does not
+        self.setDocumentLocator(xml.sax.expatreader.ExpatLocator(xmlReader))
+        while True:
+            data = input_file.read(bufsize)
+            if not data:
+                break
+            xmlReader.feed(data)
+            if self.m_syns_list:
+                yield from self.m_syns_list
+                self.m_syns_list = []
+        xmlReader.close()
+        yield from self.m_syns_list
+        self.m_syns_list = []
+
+# Streaming XML to XML transformation: read synsets one by one from input_file,
+# and write the ones kept to out, with XML header and footer.
+# @param input_file file handle of input VisDic XML file
+# @param out the output stream to write to
+# @param predicate if given, only synsets for which predicate(synset) is true are kept
+# @param transforms functions applied in order to each kept synset, each must return
+#        the (possibly modified or new) synset, or None to drop it
+# @return Counter of synsets 'read', 'written' and 'dropped'
+def transformXML(input_file, out, predicate=None, transforms=()):
+    cnt = Counter()
+    synset.Synset.writeXMLHeader(None, out)
+    for syns, _ in WNXMLParserContentHandler().iterparse(input_file):
+        cnt["read"] += 1
+        if predicate is not None and not predicate(syns):
+            cnt["dropped"] += 1
+            continue
+        for transform in transforms:
+            syns = transform(syns)
+            if syns is None:
+                break
+        if syns is None:
+            cnt["dropped"] += 1
+            continue
+        out.write(syns.toXML())
+        out.write("\n")
+        cnt["written"] += 1
+    synset.Synset.writeXMLFooter(None, out)
+    return cnt
+
@@ -3,6 +3,15 @@
 
 import re
 
+# Escaping of PCDATA: ampersands not starting an entity reference, and <, >, ', "
+_ampRe = re.compile("&(?![a-zA-Z0-9_#-]+;)")
+_specialRe = re.compile("[&<>'\"]")
+
+def escPC(string):
+    if not _specialRe.search(string):  # nothing to escape (the common case)
+        return string
+    return _ampRe.sub("&amp;", string).replace("<", "&lt;").replace(">", "&gt;").replace("'", "&apos;").replace("\"", "&quot;")
+
 class Synonym:
     def __init__(self, l, s, o="", n=""):
         self.literal = l
@@ -87,6 +96,18 @@ class Synset:
         self.vframelinks = []
         self.synonyms = []
 
+    # Make the list members immutable (tuples), see WNQuery.freeze()
+    def freeze(self):
+        self.usages = tuple(self.usages)
+        self.snotes = tuple(self.snotes)
+        self.ilrs = tuple(self.ilrs)
+        self.sumolinks = tuple(tuple(i) for i in self.sumolinks)
+        self.elrs = tuple(tuple(i) for i in self.elrs)
+        self.elrs3 = tuple(tuple(i) for i in self.elrs3)
+        self.ekszlinks = tuple(tuple(i) for i in self.ekszlinks)
+        self.vframelinks = tuple(tuple(i) for i in self.vframelinks)
+        self.synonyms = tuple(self.synonyms)
+
     @staticmethod
     def writeXMLHeader(self, out):
         """Write XML declaration, DTD reference and root opening tag to out."""
@@ -101,72 +122,58 @@ class Synset:
       
     # Write VisDic XML representation of synset to stream
     def writeXML(self, out):
-
-        print("<SYNSET>{0}{1}{2}<SYNONYM>".format(self._tagstr("ID", self.wnid), self._tagstr("ID3", self.wnid3) if self.wnid3 else "",
-                                                  self._tagstr("POS", self.pos)), end="", file=out)
-
+        print(self.toXML(), end="", file=out)
+
+    # Return VisDic XML representation of synset.
+    # Internal relations are written sorted and uniqued (inverted relations may duplicate existing ones),
+    # the synset itself is left unchanged. Tags are concatenated inline, this is the hot loop of saving.
+    def toXML(self):
+        buf = ["<SYNSET><ID>", escPC(self.wnid), "</ID>"]
+        if self.wnid3:
+            buf.append("<ID3>" + escPC(self.wnid3) + "</ID3>")
+        buf.append("<POS>" + escPC(self.pos) + "</POS><SYNONYM>")
         for i in self.synonyms:
+            buf.append("<LITERAL>" + escPC(i.literal) + "<SENSE>" + escPC(i.sense) + "</SENSE>")
             if i.lnote != "":
-                lnote_out = self._tagstr("LNOTE", i.lnote)
-            else:
-                lnote_out = ""
-
+                buf.append("<LNOTE>" + escPC(i.lnote) + "</LNOTE>")
             if i.nucleus != "":
-                nucleus_out = self._tagstr("NUCLEUS", i.nucleus)
-            else:
-                nucleus_out = ""
-
-            print("<LITERAL>{0}{1}{2}{3}</LITERAL>".format(self._EscPC(i.literal), self._tagstr("SENSE", i.sense), lnote_out, nucleus_out), end="", file=out)
-
-        print("</SYNONYM>", end="", file=out)
-
-        # uniq internal relations (remove inverted relations if needed?)
-        self.ilrs = list(sorted(set(self.ilrs)))
-
-        self._tag_helper(self.ilrs, "ILR", out)
-
-        self._tag_helper2(self.definition, "DEF", self.bcs, "BCS", out)
-
-        self._tag_helper3(self.usages, "USAGE", out)
-
-        self._tag_helper3(self.snotes, "SNOTE", out)
-
-        self._tag_helper2(self.stamp, "STAMP", self.domain, "DOMAIN", out)
-
-        self._tag_helper(self.sumolinks, "SUMO", out)
-
-        self._tag_helper2(self.nl, "NL", self.tnl, "TNL", out)
-
-        self._tag_helper(self.elrs, "ELR", out)
-
-        self._tag_helper(self.elrs3, "ELR3", out)
-
-        self._tag_helper(self.ekszlinks, "EKSZ", out)
-
-        self._tag_helper(self.vframelinks, "VFRAME", out)
-
-        print("</SYNSET>", end="", file=out)
-
-    def _tag_helper(self, var, TAG, out):
-        for key, val in var:
-            print("<{0}>{1}{2}</{0}>".format(TAG, key, self._tagstr("TYPE", val)), end="", file=out)
-
-    def _tag_helper2(self, var, TAG, var2, TAG2, out):
-        if var != "":
-            var_out = self._tagstr(TAG, var)
-        else:
-            var_out = ""
-
-        if var2 != "":
-            var2_out = self._tagstr(TAG2, var2)
-        else:
-            var2_out = ""
-
-        print("{0}{1}".format(var_out, var2_out), end="", file=out)
-
-    def _tag_helper3(self, var, TAG, out):
-        for i in var:
-            print(self._tagstr(TAG, i), end="", file=out)
+                buf.append("<NUCLEUS>" + escPC(i.nucleus) + "</NUCLEUS>")
+            buf.append("</LITERAL>")
+        buf.append("</SYNONYM>")
+
+        ilrs = self.ilrs
+        for key, val in (sorted(set(ilrs)) if len(ilrs) > 1 else ilrs):
+            buf.append("<ILR>" + key + "<TYPE>" + escPC(val) + "</TYPE></ILR>")
+
+        if self.definition != "":
+            buf.append("<DEF>" + escPC(self.definition) + "</DEF>")
+        if self.bcs != "":
+            buf.append("<BCS>" + escPC(self.bcs) + "</BCS>")
+        for i in self.usages:
+            buf.append("<USAGE>" + escPC(i) + "</USAGE>")
+        for i in self.snotes:
+            buf.append("<SNOTE>" + escPC(i) + "</SNOTE>")
+        if self.stamp != "":
+            buf.append("<STAMP>" + escPC(self.stamp) + "</STAMP>")
+        if self.domain != "":
+            buf.append("<DOMAIN>" + escPC(self.domain) + "</DOMAIN>")
+        for key, val in self.sumolinks:
+            buf.append("<SUMO>" + key + "<TYPE>" + escPC(val) + "</TYPE></SUMO>")
+        if self.nl != "":
+            buf.append("<NL>" + escPC(self.nl) + "</NL>")
+        if self.tnl != "":
+            buf.append("<TNL>" + escPC(self.tnl) + "</TNL>")
+        for key, val in self.elrs:
+            buf.append("<ELR>" + key + "<TYPE>" + escPC(val) + "</TYPE></ELR>")
+        for key, val in self.elrs3:
+            buf.append("<ELR3>" + key + "<TYPE>" + escPC(val) + "</TYPE></ELR3>")
+        for key, val in self.ekszlinks:
+            buf.append("<EKSZ>" + key + "<TYPE>" + escPC(val) + "</TYPE></EKSZ>")
+        for key, val in self.vframelinks:
+            buf.append("<VFRAME>" + key + "<TYPE>" + escPC(val) + "</TYPE></VFRAME>")
+
+        buf.append("</SYNSET>")
+        return "".join(buf)
 
     # Write string representation (see below) to stream
     def writeStr(self, out):
@@ -178,9 +185,3 @@ class Synset:
         for i in self.synonyms:
             buff.append("{0}:{1}".format(i.literal, i.sense))
         return "{0}  {{{1}}}  ({2})".format(self.wnid, ", ".join(buff), self.definition)
-
-    def _tagstr(self, tag, string):
-        return "<{0}>{1}</{0}>".format(tag, self._EscPC(string))
-
-    def _EscPC(self, string):
-        return re.sub("&(?![a-zA-Z0-9_#-]+;)", "&amp;", string).replace("<", "&lt;").replace(">", "&gt;").replace("'", "&apos;").replace("\"", "&quot;")
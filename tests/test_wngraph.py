@@ -0,0 +1,14 @@
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("scipy")
+
+import WNGraph
+
+def test_restart_duplicate_senses():
+    # _restart() only uses the number of synsets
+    ppr = WNGraph.PPRDisambiguator.__new__(WNGraph.PPRDisambiguator)
+    ppr.m_ids = ["s0", "s1", "s2", "s3"]
+    restart = ppr._restart([[[0, 0, 1]], [[2], [3, 3]]])
+    assert restart[:, 0].tolist() == pytest.approx([2 / 3, 1 / 3, 0, 0])
+    assert restart[:, 1].tolist() == pytest.approx([0, 0, 0.5, 0.5])
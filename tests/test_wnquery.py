@@ -0,0 +1,89 @@
+import os
+import math
+import json
+
+import pytest
+
+import WNQuery
+
+HEADER = "<?xml version=\"1.0\" encoding=\"UTF-8\"?>\n<!DOCTYPE WNXML SYSTEM \"wnxml.dtd\">\n<WNXML>\n"
+
+# Write a WordNet of noun synsets: (id, literals, [(target, relation), ...])
+def writeWN(path, synsets):
+    with open(path, "w", encoding="UTF-8") as fh:
+        fh.write(HEADER)
+        for wnid, literals, ilrs in synsets:
+            fh.write("<SYNSET><ID>{0}</ID><POS>n</POS><SYNONYM>".format(wnid))
+            for literal in literals:
+                fh.write("<LITERAL>{0}<SENSE>1</SENSE></LITERAL>".format(literal))
+            fh.write("</SYNONYM>")
+            for target, rel in ilrs:
+                fh.write("<ILR>{0}<TYPE>{1}</TYPE></ILR>".format(target, rel))
+            fh.write("</SYNSET>\n")
+        fh.write("</WNXML>\n")
+    return str(path)
+
+def loadWN(path, synsets):
+    return WNQuery.WNQuery(writeWN(path, synsets), open(os.devnull, "w"))
+
+# taxonomy given by explicit hyponym relations only: entity > animal > dog, entity > plant
+HYPONYM_ONLY = [("e", ["entity"], [("a", "hyponym"), ("p", "hyponym")]),
+                ("a", ["animal"], [("d", "hyponym")]),
+                ("d", ["dog"], []),
+                ("p", ["plant"], [])]
+
+@pytest.mark.parametrize("frozen", [False, True])
+def test_compatible_with_hyponym_only_relations(tmp_path, frozen):
+    wn = loadWN(tmp_path / "wn.xml", HYPONYM_ONLY)
+    if frozen:
+        wn.freeze()
+    assert wn.isLiteralCompatibleWithSynset("dog", "n", "e", True)
+    assert wn.isLiteralCompatibleWithSynset("dog", "n", "a", True)
+    assert not wn.isLiteralCompatibleWithSynset("dog", "n", "a", False)
+    assert not wn.isLiteralCompatibleWithSynset("dog", "n", "p", True)
+    assert not wn.isLiteralCompatibleWithSynset("animal", "n", "d", True)
+    assert wn.literalsCompatibleWithSynset(["dog", "plant", "entity", "cat"], "n", "a", True) == \
+        {"dog": True, "plant": False, "entity": False, "cat": False}
+
+def test_compatible_with_mixed_relations(tmp_path):
+    # cat is below animal by a hypernym relation, dog by a hyponym relation of animal
+    wn = loadWN(tmp_path / "wn.xml", HYPONYM_ONLY + [("c", ["cat"], [("a", "hypernym")])])
+    assert wn.literalsCompatibleWithSynset(["dog", "cat", "plant"], "n", "e", True) == \
+        {"dog": True, "cat": True, "plant": True}
+    assert wn.literalsCompatibleWithSynset(["dog", "cat", "plant"], "n", "a", True) == \
+        {"dog": True, "cat": True, "plant": False}
+
+# entity > animal > dog, cat; a second root
+HYPERNYM_TREE = [("e", ["entity"], []),
+                 ("a", ["animal"], [("e", "hypernym")]),
+                 ("d", ["dog"], [("a", "hypernym")]),
+                 ("c", ["cat"], [("a", "hypernym")]),
+                 ("x", ["thing"], [])]
+
+def test_jiang_conrath_identical_synsets_is_finite(tmp_path):
+    wn = loadWN(tmp_path / "wn.xml", HYPERNYM_TREE)
+    for wnid in ("d", "e"):
+        score = wn.simJiangConrath(wnid, wnid, "n")
+        assert score == WNQuery.WNQuery.maxJiangConrath
+        assert math.isfinite(score)
+        json.dumps(score, allow_nan=False)
+    assert 0.0 < wn.simJiangConrath("d", "c", "n") < WNQuery.WNQuery.maxJiangConrath
+
+def test_lin_identical_synsets_is_one(tmp_path):
+    wn = loadWN(tmp_path / "wn.xml", HYPERNYM_TREE)
+    # the root of the tree and an isolated root have information content 0
+    for wnid in ("e", "x", "d"):
+        assert wn.simLin(wnid, wnid, "n") == 1.0
+    assert wn.simLin("e", "x", "n") == 0.0
+    assert 0.0 < wn.simLin("d", "c", "n") < 1.0
+
+def test_fields_projection(tmp_path):
+    wn = WNQuery.WNQuery(writeWN(tmp_path / "wn.xml", HYPERNYM_TREE), open(os.devnull, "w"), fields=("synonyms",))
+    assert [s.wnid for s in wn.lookUpLiteral("dog", "n")] == ["d"]
+    assert wn.lookUpID("d", "n").ilrs == []
+
+def test_fields_unknown(tmp_path):
+    path = writeWN(tmp_path / "wn.xml", HYPERNYM_TREE)
+    with pytest.raises(WNQuery.WNQueryException) as e:
+        WNQuery.WNQuery(path, open(os.devnull, "w"), fields=("synonyms", "hypernyms"))
+    assert "hypernyms" in e.value.message
@@ -0,0 +1,28 @@
+import io
+
+import pytest
+
+import WNXMLParser
+
+XML = ("<?xml version=\"1.0\" encoding=\"UTF-8\"?>\n<WNXML>\n"
+       "<SYNSET><ID>d</ID><POS>n</POS><SYNONYM><LITERAL>dog<SENSE>1</SENSE></LITERAL></SYNONYM>"
+       "<ILR>a<TYPE>hypernym</TYPE></ILR><DEF>A dog.</DEF><USAGE>the dog barks</USAGE></SYNSET>\n</WNXML>\n")
+
+def parse(fields=None):
+    return [syns for syns, _ in WNXMLParser.WNXMLParserContentHandler(fields).parse(io.StringIO(XML))]
+
+def test_fields_projection():
+    full, = parse()
+    lean, = parse(("synonyms", "ilrs"))
+    assert (lean.wnid, lean.pos) == (full.wnid, full.pos) == ("d", "n")
+    assert [i.literal for i in lean.synonyms] == ["dog"]
+    assert lean.ilrs == full.ilrs == [("a", "hypernym")]
+    assert full.definition == "A dog." and lean.definition == ""
+    assert full.usages == ["the dog barks"] and not lean.usages
+
+def test_fields_unknown():
+    with pytest.raises(WNXMLParser.WNXMLParserException) as e:
+        WNXMLParser.WNXMLParserContentHandler(("synonyms", "hypernyms"))
+    assert "hypernyms" in e.value.message
+    with pytest.raises(WNXMLParser.WNXMLParserException):
+        WNXMLParser.projectSynset(parse()[0], ("definitions",))
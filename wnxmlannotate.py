@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8, vim: expandtab:ts=4 -*-
+
+# Streaming corpus annotator: attaches candidate synset ids (and optionally semantic features) to tokens.
+# Input is tab separated, one token per line (empty lines, eg. sentence boundaries, are kept as they are).
+# The lemma and the POS are taken from the given columns; without a POS column every token is looked up in the
+# POS given by --pos, or in all POS. POS tags are mapped to WordNet POS (n, v, a, b), see POSMAP.
+# Output is the input line with a column of comma separated synset ids (pos:id when looking up in all POS)
+# appended, and a column of semantic features if a features file is given ("_" for none).
+# The input is processed in chunks, optionally by worker processes; the output keeps the input order.
+# Usage: python wnxmlannotate.py <WN_XML_file> [<semantic_features_XML_file>] [options] < corpus.tsv, see --help.
+
+import sys
+import os
+import argparse
+import itertools
+import multiprocessing
+from collections import deque
+
+import WNQuery
+import SemFeatures
+
+# Corpus POS tags (lowercase) -> WordNet POS
+POSMAP = {"n": "n", "noun": "n", "propn": "n", "v": "v", "verb": "v", "a": "a", "adj": "a", "b": "b", "r": "b",
+          "adv": "b"}
+
+# State of the annotator: WordNet, SemFeatures and settings (in worker processes too)
+_state = dict()
+
+def _setup(wn, sf, lemmacol=0, poscol=1, pos=None):
+    _state.update(wn=wn, sf=sf, lemmacol=lemmacol, poscol=poscol, pos=pos)
+
+# Initializer of worker processes: load the WordNet if it was not inherited from the parent (fork)
+def _init_worker(wnfile, sffile, lemmacol, poscol, pos):
+    if "wn" in _state:
+        return
+    wn = WNQuery.WNQuery(wnfile, open(os.devnull, "w"))
+    sf = None
+    if sffile:
+        sf = SemFeatures.SemFeaturesParserContentHandler(wn)
+        sf.readXML(sffile)
+    _setup(wn, sf, lemmacol, poscol, pos)
+
+# Get the (lemma, POS) keys to look up for a line: empty for empty lines or unknown POS tags
+def _keys(line):
+    fields = line.split("\t")
+    lemmacol, poscol = _state["lemmacol"], _state["poscol"]
+    if not line or len(fields) <= lemmacol:
+        return ()
+    lemma = fields[lemmacol]
+    if poscol is not None and poscol < len(fields):
+        pos = POSMAP.get(fields[poscol].lower())
+        return ((lemma, pos),) if pos is not None else ()
+    if _state["pos"] is not None:
+        return ((lemma, _state["pos"]),)
+    return tuple((lemma, pos) for pos in ("n", "v", "a", "b"))
+
+# Annotate a chunk of lines (without line endings), every distinct token is looked up only once.
+# @return the annotated lines as one string
+def annotateChunk(lines):
+    wn, sf = _state["wn"], _state["sf"]
+    allpos = _state["poscol"] is None and _state["pos"] is None
+    keys = [_keys(line) for line in lines]
+    uniq = sorted(set(itertools.chain.from_iterable(keys)))
+    ids = {key: wn.idx(key[1]).get(key[0], ()) for key in uniq}
+    feats = dict(zip(uniq, sf.tagTokens(uniq))) if sf is not None else None
+
+    buf = []
+    for line, lkeys in zip(lines, keys):
+        if not line:
+            buf.append("\n")
+            continue
+        if allpos:
+            cand = ["{0}:{1}".format(key[1], wnid) for key in lkeys for wnid in ids[key]]
+        else:
+            cand = [wnid for key in lkeys for wnid in ids[key]]
+        cols = [line, ",".join(cand) or "_"]
+        if feats is not None:
+            cols.append(",".join(sorted(set(itertools.chain.from_iterable(feats[key] for key in lkeys)))) or "_")
+        buf.append("\t".join(cols))
+        buf.append("\n")
+    return "".join(buf)
+
+def _chunks(stream, size):
+    while True:
+        chunk = [line.rstrip("\r\n") for line in itertools.islice(stream, size)]
+        if not chunk:
+            return
+        yield chunk
+
+# Annotate a token stream.
+# @param wn the WNQuery object (worker processes inherit it when the platform can fork, otherwise they load wnfile)
+# @param sf SemFeatures object, or None
+# @param stream input lines
+# @param out output stream
+# @param chunksize number of lines per chunk
+# @param workers number of worker processes (0: annotate in this process)
+# @param lemmacol index of the lemma column
+# @param poscol index of the POS column (None if there is none)
+# @param pos POS of all tokens when there is no POS column (None: all POS)
+# @param wnfile, sffile files to load in worker processes that can not inherit the objects
+# @return number of lines annotated
+def annotate(wn, sf, stream, out, chunksize=10000, workers=0, lemmacol=0, poscol=1, pos=None, wnfile=None,
+             sffile=None):
+    _setup(wn, sf, lemmacol, poscol, pos)
+    cnt = 0
+    if workers <= 0:
+        for chunk in _chunks(stream, chunksize):
+            out.write(annotateChunk(chunk))
+            cnt += len(chunk)
+        return cnt
+
+    if "fork" in multiprocessing.get_all_start_methods():
+        ctx = multiprocessing.get_context("fork")  # workers share the loaded objects (copy-on-write)
+    else:
+        ctx = multiprocessing.get_context()
+        if wnfile is None:
+            raise WNQuery.WNQueryException("Worker processes can not inherit the WordNet, give the file to load")
+    # at most 2 chunks per worker are in flight, so memory is bounded whatever the size of the input
+    pending = deque()
+    with ctx.Pool(workers, _init_worker, (wnfile, sffile, lemmacol, poscol, pos)) as pool:
+        for chunk in _chunks(stream, chunksize):
+            if len(pending) >= 2 * workers:
+                out.write(pending.popleft().get())
+            pending.append(pool.apply_async(annotateChunk, (chunk,)))
+            cnt += len(chunk)
+        while pending:
+            out.write(pending.popleft().get())
+    return cnt
+
+def main():
+    parser = argparse.ArgumentParser(description="Annotate a tokenized corpus with candidate synsets")
+    parser.add_argument("wnxml", metavar="WN_XML_file")
+    parser.add_argument("semfeatures", metavar="semantic_features_XML_file", nargs="?")
+    parser.add_argument("-i", "--input", help="input file (default: standard input)")
+    parser.add_argument("-o", "--output", help="output file (default: standard output)")
+    parser.add_argument("--lemma", type=int, default=0, help="index of the lemma column (default: 0)")
+    parser.add_argument("--pos-column", type=int, default=1,
+                        help="index of the POS column (default: 1), -1 if there is none")
+    parser.add_argument("--pos", choices=("n", "v", "a", "b"), help="POS of all tokens when there is no POS column")
+    parser.add_argument("--chunksize", type=int, default=10000, help="lines per chunk")
+    parser.add_argument("--workers", type=int, default=0, help="number of worker processes (default: 0, no workers)")
+    args = parser.parse_args()
+
+    print("Reading XML...", file=sys.stderr)
+    wn = WNQuery.WNQuery(args.wnxml, open(os.devnull, "w"))
+    sf = None
+    if args.semfeatures:
+        print("Reading SemFeatures...", file=sys.stderr)
+        sf = SemFeatures.SemFeaturesParserContentHandler(wn)
+        sf.readXML(args.semfeatures)
+        sf.precomputeClosures()
+
+    inp = open(args.input, "r", encoding="UTF-8") if args.input else sys.stdin
+    try:
+        out = open(args.output, "w", encoding="UTF-8") if args.output else sys.stdout
+        try:
+            cnt = annotate(wn, sf, inp, out, args.chunksize, args.workers, args.lemma,
+                           args.pos_column if args.pos_column >= 0 else None, args.pos, args.wnxml, args.semfeatures)
+        finally:
+            # only close the files opened here, not the standard streams
+            if out is not sys.stdout:
+                out.close()
+            else:
+                out.flush()
+    finally:
+        if inp is not sys.stdin:
+            inp.close()
+    print("{0} lines annotated".format(cnt), file=sys.stderr)
+
+if __name__ == '__main__':
+    main()
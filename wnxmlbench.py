@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8, vim: expandtab:ts=4 -*-
+
+# Benchmark suite for WNQuery, the XML parser and SemFeatures, on a deterministic synthetic WordNet.
+# Usage: python wnxmlbench.py [options], see --help.
+# Results are written as JSON, so runs on different commits can be compared with --compare.
+
+import sys
+import os
+import io
+import json
+import time
+import random
+import argparse
+import platform
+import tempfile
+import subprocess
+from collections import deque
+
+import synset
+import WNQuery
+import SemFeatures
+
+# Generate a synthetic WordNet in VisDic XML format.
+# Nouns and verbs form hypernym trees (roots are the top level synsets), adjectives form rings of similar_to relations.
+# @param out the output stream to write to
+# @param synsets number of noun synsets (there are synsets/4 verbs and synsets/4 adjectives)
+# @param polysemy average number of senses per literal
+# @param depth maximum depth of the hypernym trees
+# @param branching number of hyponyms of every non-leaf synset
+# @param similar length of the similar_to cycles among adjectives
+# @param multi fraction of noun synsets having a second hypernym
+# @param seed random seed, the output depends only on the parameters
+# @return dict: pos -> list of synset ids
+def generateXML(out, synsets=10000, polysemy=2.0, depth=8, branching=4, similar=5, multi=0.02, seed=0):
+    rnd = random.Random(seed)
+    synset.Synset.writeXMLHeader(None, out)
+    res = dict()
+    for pos, count in (("n", synsets), ("v", synsets // 4), ("a", synsets // 4)):
+        ids = ["SYN-{0:08d}-{1}".format(i, pos) for i in range(count)]
+        res[pos] = ids
+        # literals: about 1.5 synonyms per synset, each literal having 'polysemy' senses on average
+        nlit = max(1, int(count * 1.5 / polysemy))
+        vocab = ["{0}{1}".format(pos, i) for i in range(nlit)]
+        senses = dict()
+        # hypernyms: breadth first filling of trees with given branching, new root when all trees are full
+        parents = [None] * count
+        if pos != "a":
+            levels = [0] * count
+            children = [0] * count
+            queue = deque()
+            for i in range(count):
+                while queue and children[queue[0]] >= branching:
+                    queue.popleft()
+                if queue:
+                    parent = queue[0]
+                    parents[i] = parent
+                    levels[i] = levels[parent] + 1
+                    children[parent] += 1
+                if levels[i] + 1 < depth:
+                    queue.append(i)
+        for i, wnid in enumerate(ids):
+            syns = synset.Synset()
+            syns.wnid = wnid
+            syns.pos = pos
+            syns.definition = "Definition of {0} & co.".format(wnid)
+            syns.domain = "domain{0}".format(i % 50)
+            syns.sumolinks.append(("Term{0}".format(i % 200), "+"))
+            for literal in set(rnd.choice(vocab) for _ in range(1 + (rnd.random() < 0.5))):
+                senses[literal] = senses.get(literal, 0) + 1
+                syns.synonyms.append(synset.Synonym(literal, str(senses[literal])))
+            if parents[i] is not None:
+                syns.ilrs.append((ids[parents[i]], "hypernym"))
+                if pos == "n" and rnd.random() < multi:
+                    other = rnd.randrange(i)
+                    if other != parents[i]:
+                        syns.ilrs.append((ids[other], "hypernym"))
+            if pos == "a" and similar > 1:
+                ring = i - i % similar
+                nxt = ring + (i - ring + 1) % similar
+                if nxt < count and nxt != i:
+                    syns.ilrs.append((ids[nxt], "similar_to"))
+            out.write(syns.toXML())
+            out.write("\n")
+    synset.Synset.writeXMLFooter(None, out)
+    return res
+
+# Generate a semantic features file: one feature per synset of the second level of the noun trees.
+def generateFeatures(out, wn, nfeatures=20):
+    dat = wn.dat("n")
+    tops = [wnid for wnid, syns in dat.items() if not wn.lookUpRelation(wnid, "n", "hypernym")]
+    feats = [child for top in tops for child in wn.lookUpRelation(top, "n", "hyponym")][:nfeatures]
+    print("<?xml version=\"1.0\" encoding=\"UTF-8\"?>\n<semfeatures>", file=out)
+    for i, wnid in enumerate(feats):
+        print("<semfeature name=\"F{0}\"><synset id=\"{1}\"/></semfeature>".format(i, wnid), file=out)
+    print("</semfeatures>", file=out)
+
+# Time func(arg) for all args, repeat times, keep the best run.
+def _time(func, args, repeat):
+    best = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for arg in args:
+            func(*arg)
+        elapsed = time.perf_counter() - t0
+        if best is None or elapsed < best:
+            best = elapsed
+    return {"n": len(args), "total": best, "per_op_us": best / max(1, len(args)) * 1e6}
+
+# Time a single call of func (for one-off operations, like building caches).
+def _once(func):
+    t0 = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - t0
+    return {"n": 1, "total": elapsed, "per_op_us": elapsed * 1e6}
+
+def run(args):
+    devnull = open(os.devnull, "w")
+    results = dict()
+    xmlfile = os.path.join(args.workdir, "bench_wn.xml")
+    featfile = os.path.join(args.workdir, "bench_sf.xml")
+    with open(xmlfile, "w", encoding="UTF-8") as fh:
+        generateXML(fh, args.synsets, args.polysemy, args.depth, args.branching, args.similar, seed=args.seed)
+
+    # load phases, as measured by WNQuery itself
+    best = None
+    for _ in range(args.repeat):
+        wn = WNQuery.WNQuery(xmlfile, devnull)
+        phases = wn.loadStats().phases
+        if best is None or phases["total"] < best["total"]:
+            best = phases
+    for phase, secs in best.items():
+        results["load." + phase] = {"n": 1, "total": secs, "per_op_us": secs * 1e6}
+
+    rnd = random.Random(args.seed)
+    literals = sorted(wn.idx("n").keys())
+    ids = sorted(wn.dat("n").keys())
+    lits = [(rnd.choice(literals), "n") for _ in range(args.queries)]
+    wnids = [(rnd.choice(ids), "n") for _ in range(args.queries)]
+    pairs = [(rnd.choice(literals), rnd.choice(literals), "n", "hypernym", True) for _ in range(args.queries // 10)]
+
+    results["lookUpLiteral"] = _time(wn.lookUpLiteral, lits, args.repeat)
+    results["traceRelation.hypernym"] = _time(lambda i, p: wn.traceRelation(i, p, "hypernym"), wnids, args.repeat)
+    results["traceRelationOS.hyponym"] = _time(lambda i, p: wn.traceRelationOS(i, p, "hyponym"), wnids, args.repeat)
+    results["getMaxDepth"] = _time(lambda i, p: wn.getMaxDepth(i, p, "hypernym"), wnids, args.repeat)
+    results["getLeaChoD"] = _once(lambda: wn.getLeaChoD("n", "hypernym"))
+    results["lcsIndex"] = _once(lambda: wn.lcsIndex("n", "hypernym"))
+    results["similarityLeacockChodorow"] = _time(wn.similarityLeacockChodorow, pairs, args.repeat)
+    results["lowestCommonSubsumer"] = _time(lambda i, j: wn.lowestCommonSubsumer(i[0], j[0], "n"),
+                                            list(zip(wnids, reversed(wnids))), args.repeat)
+    results["isLiteralCompatibleWithSynset.hyponyms"] = _time(
+        lambda l, p: wn.isLiteralCompatibleWithSynset(l, p, ids[0], True), lits[:args.queries // 10], args.repeat)
+    results["writeXML"] = _time(lambda: wn.writeXML(io.StringIO()), [()], args.repeat)
+
+    with open(featfile, "w", encoding="UTF-8") as fh:
+        generateFeatures(fh, wn)
+    sf = SemFeatures.SemFeaturesParserContentHandler(wn)
+    results["SemFeatures.readXML"] = _once(lambda: sf.readXML(featfile))
+    features = sorted(sf.m_featmap.keys())
+    checks = [(lit, "n", rnd.choice(features)) for lit, _ in lits]
+    results["SemFeatures.isLiteralCompatibleWithFeature"] = _time(sf.isLiteralCompatibleWithFeature, checks, args.repeat)
+    results["SemFeatures.classifyLiterals"] = _time(lambda: sf.classifyLiterals([l for l, _ in lits], "n"), [()], args.repeat)
+    return results
+
+def _commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL,
+                                       cwd=os.path.dirname(os.path.abspath(__file__))).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(old, new, out):
+    print("{0:45s} {1:>12s} {2:>12s} {3:>8s}".format("benchmark", "old (us/op)", "new (us/op)", "ratio"), file=out)
+    for name in sorted(new["results"]):
+        n = new["results"][name]["per_op_us"]
+        if name in old["results"]:
+            o = old["results"][name]["per_op_us"]
+            print("{0:45s} {1:12.2f} {2:12.2f} {3:8.2f}".format(name, o, n, n / o if o else float("inf")), file=out)
+        else:
+            print("{0:45s} {1:>12s} {2:12.2f}".format(name, "-", n), file=out)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark WNQuery on a synthetic WordNet")
+    parser.add_argument("--synsets", type=int, default=10000, help="number of noun synsets")
+    parser.add_argument("--polysemy", type=float, default=2.0, help="average number of senses per literal")
+    parser.add_argument("--depth", type=int, default=8, help="maximum depth of hypernym trees")
+    parser.add_argument("--branching", type=int, default=4, help="hyponyms per non-leaf synset")
+    parser.add_argument("--similar", type=int, default=5, help="length of similar_to cycles among adjectives")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--queries", type=int, default=1000, help="number of queries per benchmark")
+    parser.add_argument("--repeat", type=int, default=3, help="repetitions, the best one is kept")
+    parser.add_argument("--workdir", default=tempfile.gettempdir(), help="directory for the generated XML files")
+    parser.add_argument("-o", "--output", help="write JSON results to this file")
+    parser.add_argument("--compare", help="JSON results of an earlier run to compare with")
+    parser.add_argument("--generate", help="only generate the synthetic XML to this file and exit")
+    args = parser.parse_args()
+
+    if args.generate:
+        with open(args.generate, "w", encoding="UTF-8") as fh:
+            generateXML(fh, args.synsets, args.polysemy, args.depth, args.branching, args.similar, seed=args.seed)
+        return
+
+    results = {"meta": {"commit": _commit(), "python": platform.python_version(), "platform": platform.platform(),
+                        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                        "params": {key: val for key, val in vars(args).items()
+                                   if key not in ("output", "compare", "generate", "workdir")}},
+               "results": run(args)}
+    if args.output:
+        with open(args.output, "w", encoding="UTF-8") as fh:
+            json.dump(results, fh, indent=2, sort_keys=True)
+    if args.compare:
+        with open(args.compare, "r", encoding="UTF-8") as fh:
+            compare(json.load(fh), results, sys.stdout)
+    else:
+        for name, res in sorted(results["results"].items()):
+            print("{0:45s} {1:8d} ops {2:10.4f} s {3:12.2f} us/op".format(name, res["n"], res["total"], res["per_op_us"]))
+
+if __name__ == '__main__':
+    main()
@@ -3,6 +3,9 @@
 
 import sys
 import os
+import io
+import json
+import argparse
 try:
     import readline
 except:
@@ -25,8 +28,8 @@ def process_query(wn, sf, query, out):
         buf.append(".rl  <literal> <pos>                              list known relations of all senses of literal in POS")
         buf.append(".rl  <literal> <pos> <relation>                   look up relation (hypernym, hyponym) of all senses of literal with id and POS, list target ids")
         buf.append(".ri  <id> <pos> <relation>                        look up relation of synset with id and POS, list target ids")
-        buf.append(".ti  <id> <pos> <relation>                        trace relations of synset with id and POS")
-        buf.append(".tl  <literal> <pos> <relation>                   trace relations of all senses of literal in POS")
+        buf.append(".ti  <id> <pos> <relation> [<depth>]              trace relations of synset with id and POS (down to depth)")
+        buf.append(".tl  <literal> <pos> <relation> [<depth>]         trace relations of all senses of literal in POS (down to depth)")
         buf.append(".ci  <id> <pos> <relation> <id1> [<id2>...]       check if any of id1,id2,... is reachable from id by following relation")
         buf.append(".cl  <literal> <pos> <relation> <id1> [<id2>...]  check if any of id1,id2,... is reachable from any sense of literal by following relation")
         buf.append(".cli <literal> <pos> <id> [hyponyms]              check if synset contains literal, or if \"hyponyms\" is added, any of its hyponyms")
@@ -103,7 +106,7 @@ def process_query(wn, sf, query, out):
                     rs = set()
                     for _, rel in j.ilrs:
                         if rel not in rs:
-                            print("  {0}".format(rel))
+                            print("  {0}".format(rel), file=out)
                             rs.add(rel)
                     print("", file=out)
 
@@ -136,19 +139,15 @@ def process_query(wn, sf, query, out):
         return
 
     if t[0] == ".ti":   # .ti
-        if len(t) != 4:
+        if len(t) < 4 or len(t) > 5 or (len(t) == 5 and not t[4].isdigit()):
             print("Incorrect format for command {0}\n".format(t[0]), file=out)
             return
 
-        oss = wn.traceRelationOS(t[1], t[2], t[3])
-        if not oss:
-            print("Synset not found\n", file=out)
-        else:
-            print("\n".join(oss), end="\n\n", file=out)
+        write_trace(wn, t[1], t[2], t[3], int(t[4]) if len(t) == 5 else None, out)
         return
 
     if t[0] == ".tl":   # .tl
-        if len(t) != 4:
+        if len(t) < 4 or len(t) > 5 or (len(t) == 5 and not t[4].isdigit()):
             print("Incorrect format for command {0}\n".format(t[0]), file=out)
             return
 
@@ -157,11 +156,7 @@ def process_query(wn, sf, query, out):
             print("Literal not found\n", file=out)
         else:
             for i in senses:
-                oss = wn.traceRelationOS(i.wnid, t[2], t[3])
-                if not oss:
-                    print("Synset not found\n", file=out)
-                else:
-                    print("\n".join(oss), end="\n\n", file=out)
+                write_trace(wn, i.wnid, t[2], t[3], int(t[4]) if len(t) == 5 else None, out)
         return
 
     if t[0] == ".ci":   # .ci
@@ -266,6 +261,128 @@ def process_query(wn, sf, query, out):
 
     print("Unknown command\n", file=out)
 
+# Number of arguments (besides the command) accepted by each command, for query_json()
+_ARITY = {".h": (0,), ".i": (2,), ".l": (1, 2, 3), ".rl": (2, 3), ".ri": (3,), ".ti": (3, 4), ".tl": (3, 4),
+          ".ci": None, ".cl": None, ".s": (1,), ".sc": (3,), ".cli": (3, 4), ".slc": (4, 5), ".md": (3,), ".sg": (3,)}
+
+# Structured representation of a synset for query_json()
+def synset_json(syns):
+    return {"id": syns.wnid, "pos": syns.pos, "literals": [[i.literal, i.sense] for i in syns.synonyms],
+            "definition": syns.definition}
+
+# Structured trace (like traceRelationOS) for query_json(): list of synsets with their depth
+# (synsets closing a cycle are only given by id, with "cycle": true)
+def trace_json(wn, wnid, pos, rel, maxdepth=None):
+    res = []
+    for i, depth, flag in wn.iterTraceRelation(wnid, pos, rel, maxdepth):
+        if flag == "cycle":
+            res.append({"id": i, "depth": depth, "cycle": True})
+        else:
+            res.append(dict(synset_json(wn.lookUpID(i, pos)), depth=depth))
+    return res
+
+# Like process_query(), but return the results as a dict (for JSON output) instead of printing formatted text.
+# The dict always has "query" and "command" keys, and either the results or an "error" key.
+def query_json(wn, sf, query):
+    t = query.split(" ")
+    cmd = t[0]
+    res = {"query": query, "command": cmd}
+    if cmd not in _ARITY:
+        res["error"] = "Unknown command"
+        return res
+    arity = _ARITY[cmd]
+    if (arity is not None and len(t) - 1 not in arity) or (arity is None and len(t) < 5) or \
+            (cmd == ".cli" and len(t) == 5 and t[4] != "hyponyms") or (cmd == ".slc" and len(t) == 6 and t[5] != "top") or \
+            (cmd in (".ti", ".tl") and len(t) == 5 and not t[4].isdigit()):
+        res["error"] = "Incorrect format for command {0}".format(cmd)
+        return res
+    if cmd in (".s", ".sc") and not sf:
+        res["error"] = "Semantic features not loaded"
+        return res
+
+    if cmd == ".h":
+        buf = io.StringIO()
+        process_query(wn, sf, ".h", buf)
+        res["help"] = buf.getvalue().strip().split("\n")[1:]
+    elif cmd == ".i":
+        syns = wn.lookUpID(t[1], t[2])
+        res["synsets"] = [synset_json(syns)] if syns else []
+    elif cmd == ".l":
+        if len(t) == 2:
+            res["synsets"] = [synset_json(i) for pos in ("n", "v", "a", "b") for i in wn.lookUpLiteral(t[1], pos)]
+        elif len(t) == 3:
+            res["synsets"] = [synset_json(i) for i in wn.lookUpLiteral(t[1], t[2])]
+        else:
+            syns = wn.lookUpSense(t[1], int(t[2]), t[3])
+            res["synsets"] = [synset_json(syns)] if syns else []
+    elif cmd == ".rl":
+        res["senses"] = []
+        for j in wn.lookUpLiteral(t[1], t[2]):
+            if len(t) == 3:
+                rels = []
+                for _, rel in j.ilrs:
+                    if rel not in rels:
+                        rels.append(rel)
+                res["senses"].append({"synset": synset_json(j), "relations": rels})
+            else:
+                targets = [wn.lookUpID(i, t[2]) for i in wn.lookUpRelation(j.wnid, t[2], t[3])]
+                res["senses"].append({"synset": synset_json(j), "targets": [synset_json(i) for i in targets if i]})
+    elif cmd == ".ri":
+        targets = [wn.lookUpID(i, t[2]) for i in wn.lookUpRelation(t[1], t[2], t[3])]
+        res["targets"] = [synset_json(i) for i in targets if i]
+    elif cmd == ".ti":
+        res["trace"] = trace_json(wn, t[1], t[2], t[3], int(t[4]) if len(t) == 5 else None)
+    elif cmd == ".tl":
+        res["traces"] = [trace_json(wn, i.wnid, t[2], t[3], int(t[4]) if len(t) == 5 else None)
+                         for i in wn.lookUpLiteral(t[1], t[2])]
+    elif cmd == ".ci":
+        res["target"] = wn.isIDConnectedWith(t[1], t[2], t[3], set(t[4:]))
+    elif cmd == ".cl":
+        res["sense"], res["target"] = wn.isLiteralConnectedWith(t[1], t[2], t[3], set(t[4:]))
+    elif cmd == ".s":
+        res["synset_ids"] = sorted(sf.lookUpFeature(t[1]))
+    elif cmd == ".sc":
+        res["sense"], res["feature_synset"] = sf.isLiteralCompatibleWithFeature(t[1], t[2], t[3])
+    elif cmd == ".cli":
+        res["compatible"] = wn.isLiteralCompatibleWithSynset(t[1], t[2], t[3], len(t) == 5)
+    elif cmd == ".slc":
+        sims = wn.similarityLeacockChodorow(t[1], t[2], t[3], t[4], len(t) == 6)
+        res["scores"] = [{"score": key, "id1": wnid1, "id2": wnid2} for key, (wnid1, wnid2) in sorted(sims.items(), reverse=True)]
+    elif cmd == ".md":
+        res["depth"] = wn.getMaxDepth(t[1], t[2], t[3])
+    elif cmd == ".sg":
+        res["size"] = wn.getSubGraphSize(t[1], t[2], t[3])
+    return res
+
+# Run queries read from the given files (or stdin) without prompting, writing results to out.
+# Empty lines and lines starting with '#' are skipped, '.q' stops processing.
+# @param fmt text (same output as the interactive mode) or jsonl (one JSON object per query, see query_json())
+# @return number of queries run
+def run_batch(wn, sf, inputs, out, fmt="text"):
+    cnt = 0
+    for fh in inputs:
+        for line in fh:
+            line = line.strip()
+            if line == "" or line.startswith("#"):
+                continue
+            if line == ".q":
+                return cnt
+            cnt += 1
+            try:
+                if fmt == "jsonl":
+                    out.write(json.dumps(query_json(wn, sf, line), ensure_ascii=False))
+                    out.write("\n")
+                else:
+                    process_query(wn, sf, line, out)
+            except (WNQuery.InvalidPOSException, ValueError) as e:
+                if fmt == "jsonl":
+                    out.write(json.dumps({"query": line, "command": line.split(" ")[0], "error": getattr(e, "message", str(e))},
+                                         ensure_ascii=False))
+                    out.write("\n")
+                else:
+                    print(e, file=sys.stderr)
+    return cnt
+
 # This is exact same function as Synset.writeStr(out)
 def write_synset(syns, out):
     buff = []
@@ -274,6 +391,15 @@ def write_synset(syns, out):
     print("{0}  {{{1}}}  ({2})".format(syns.wnid, ", ".join(buff), syns.definition), file=out)
 
 
+# Write the trace of synset line by line, as it is produced (see WNQuery.iterTraceRelationOS())
+def write_trace(wn, wnid, pos, rel, maxdepth, out):
+    found = False
+    for line in wn.iterTraceRelationOS(wnid, pos, rel, maxdepth):
+        print(line, file=out)
+        found = True
+    print("" if found else "Synset not found\n", file=out)
+
+
 def write_synset_id(wn, wnid, pos, out):
     syns = wn.lookUpID(wnid, pos)
     if syns:
@@ -281,26 +407,53 @@ def write_synset_id(wn, wnid, pos, out):
 
 
 def main():
-    if len(sys.argv) != 2 and len(sys.argv) != 3:
-        print("Usage:\n  {0} <WN_XML_file> [<semantic_features_XML_file>]".format(sys.argv[0]), file=sys.stderr)
-        sys.exit(1)
+    parser = argparse.ArgumentParser(description="Query WordNet XML files with simple command strings (type .h for help).")
+    parser.add_argument("wnxml", metavar="WN_XML_file")
+    parser.add_argument("semfeatures", metavar="semantic_features_XML_file", nargs="?")
+    parser.add_argument("--batch", action="store_true",
+                        help="run queries from the input files (default: standard input) instead of prompting")
+    parser.add_argument("-i", "--input", metavar="FILE", action="append",
+                        help="query file in batch mode ('-' for standard input), can be repeated; implies --batch")
+    parser.add_argument("--format", choices=("text", "jsonl"), default="text",
+                        help="output format in batch mode: text, or JSON Lines with structured results")
+    args = parser.parse_intermixed_args()  # the files may come after --batch
+    batch = args.batch or args.input is not None
+    if args.format != "text" and not batch:
+        parser.error("--format {0} is only available in batch mode (--batch)".format(args.format))
 
     # init WN
     print("Reading XML...", file=sys.stderr)
     # Logging to devnull for all OS
     # Source: http://stackoverflow.com/a/2929946
-    wn = WNQuery.WNQuery(sys.argv[1], open(os.devnull, "w"))
+    wn = WNQuery.WNQuery(args.wnxml, open(os.devnull, "w"))
     wn.writeStats(sys.stderr)
 
     # init SemFeatures (if appl.)
-    if len(sys.argv) == 3:
+    if args.semfeatures:
         print("Reading SemFeatures...", file=sys.stderr)
         sf = SemFeatures.SemFeaturesParserContentHandler(wn)
-        stats = sf.readXML(sys.argv[2])
+        stats = sf.readXML(args.semfeatures)
         print("{0} pairs read".format(stats), file=sys.stderr)
     else:
         sf = None
 
+    # batch mode
+    if batch:
+        inputs = []
+        try:
+            for f in args.input or ["-"]:
+                inputs.append(sys.stdin if f == "-" else open(f, "r", encoding="UTF-8"))
+            # buffered output, queries can produce lots of small writes
+            out = open(sys.stdout.fileno(), "w", encoding="UTF-8", buffering=1 << 16, closefd=False)
+            with out:
+                cnt = run_batch(wn, sf, inputs, out, args.format)
+        finally:
+            for fh in inputs:
+                if fh is not sys.stdin:
+                    fh.close()
+        print("{0} queries processed".format(cnt), file=sys.stderr)
+        sys.exit(0)
+
     # query loop
     print("Type your query, or .h for help, .q to quit", file=sys.stderr)
     while True:
@@ -313,7 +466,7 @@ def main():
         elif line != "":
             try:
                 process_query(wn, sf, line, sys.stdout)
-            except InvalidPOSException as e:
+            except (InvalidPOSException, WNQuery.InvalidPOSException) as e:
                 print(e, file=sys.stderr)
 
 class InvalidPOSException(Exception):
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8, vim: expandtab:ts=4 -*-
+
+# Concurrency stress test of a WNQuery object shared by many threads, without any locking.
+# Runs a mixed query workload from many threads on one shared instance in two phases: first unfrozen and cold,
+# so that the lazily built tables (attribute indices, depth/IC tables, LCS indices) are built concurrently,
+# then frozen (see WNQuery.freeze()). The expand() cache of the shared instance is kept small, so that its
+# entries are evicted while other threads use it. Every result is checked against a single threaded run
+# on a separate instance.
+# Usage: python wnxmlstress.py <WN_XML_file> [<threads> [<rounds>]]
+
+import sys
+import os
+import time
+import random
+import threading
+
+import WNQuery
+
+# Size of the expand() cache of the shared instance
+EXPAND_CACHE_SIZE = 64
+
+# Build a deterministic list of queries: (name, function) pairs, the function takes the WNQuery object to query
+def make_queries(wn, n=200, seed=42):
+    rnd = random.Random(seed)
+    queries = []
+    for pos in ("n", "v", "a", "b"):
+        literals = sorted(wn.idx(pos).keys())
+        ids = sorted(wn.dat(pos).keys())
+        if not literals:
+            continue
+        for _ in range(n):
+            literal = rnd.choice(literals)
+            literal2 = rnd.choice(literals)
+            wnid = rnd.choice(ids)
+            wnid2 = rnd.choice(ids)
+            pairs = [(rnd.choice(ids), rnd.choice(ids)) for _ in range(5)]
+            measure = rnd.choice(("wup", "res", "lin", "jcn"))
+            queries.append(("lookUpLiteral", lambda w, l=literal, p=pos: [s.wnid for s in w.lookUpLiteral(l, p)]))
+            queries.append(("lookUpRelation", lambda w, i=wnid, p=pos: w.lookUpRelation(i, p, "hypernym")))
+            queries.append(("traceRelation", lambda w, i=wnid, p=pos: w.traceRelation(i, p, "hypernym")))
+            queries.append(("getMaxDepth", lambda w, i=wnid, p=pos: w.getMaxDepth(i, p, "hypernym")))
+            queries.append(("isLiteralConnectedWith",
+                            lambda w, l=literal, i=wnid, p=pos: w.isLiteralConnectedWith(l, p, "hypernym", {i})))
+            queries.append(("similarityLeacockChodorow",
+                            lambda w, l1=literal, l2=literal2, p=pos:
+                                sorted(w.similarityLeacockChodorow(l1, l2, p, "hypernym", True).items())))
+            queries.append(("similarityBatch",
+                            lambda w, q=pairs, p=pos, m=measure: w.similarityBatch(q, p, "hypernym", m, True)))
+            queries.append(("lowestCommonSubsumer",
+                            lambda w, i=wnid, j=wnid2, p=pos: w.lowestCommonSubsumer(i, j, p, "hypernym", True)))
+            queries.append(("literalsCompatibleWithSynset",
+                            lambda w, l1=literal, l2=literal2, i=wnid, p=pos:
+                                w.literalsCompatibleWithSynset([l1, l2], p, i, True)))
+            queries.append(("lookUpNeighbourhood",
+                            lambda w, i=wnid, p=pos:
+                                w.lookUpNeighbourhood(i, p, {"hypernym": 2, "hyponym": 1}, maxResults=50)))
+            queries.append(("expand", lambda w, l=literal, p=pos: w.expand(l, p, {"hypernym": 1, "hyponym": 1})))
+            queries.append(("expand weighted",
+                            lambda w, l=literal, p=pos: w.expand(l, p, {"hyponym": 2}, weights=0.5)))
+            queries.append(("expandBulk",
+                            lambda w, l1=literal, l2=literal2, p=pos: w.expandBulk([l1, l2], p, {"hypernym": 1})))
+            queries.append(("writeXML", lambda w, i=wnid, p=pos: w.lookUpID(i, p).toXML()))
+    return queries
+
+# Run the queries from many threads on the shared object, each thread in its own order.
+# @return list of wrong results: (thread, query name, result, expected result)
+def run(wn, queries, expected, nthreads, rounds, label):
+    errors = []
+    barrier = threading.Barrier(nthreads)
+
+    def worker(num):
+        order = list(range(len(queries)))
+        random.Random(num).shuffle(order)
+        barrier.wait()
+        for _ in range(rounds):
+            for i in order:
+                try:
+                    res = queries[i][1](wn)
+                except Exception as e:
+                    res = e
+                if res != expected[i]:
+                    errors.append((num, queries[i][0], res, expected[i]))
+
+    threads = [threading.Thread(target=worker, args=(num,)) for num in range(nthreads)]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - t0
+
+    gil = sys._is_gil_enabled() if hasattr(sys, "_is_gil_enabled") else True
+    total = nthreads * rounds * len(queries)
+    print("{0}: Python {1} (GIL {2}), {3} threads, {4} queries in {5:.2f} s ({6:.0f} queries/s)".format(
+        label, sys.version.split()[0], "enabled" if gil else "disabled", nthreads, total, elapsed, total / elapsed))
+    for num, name, res, exp in errors[:10]:
+        print("Thread {0}: {1} returned {2!r}, expected {3!r}".format(num, name, res, exp))
+    return errors
+
+def main():
+    if len(sys.argv) < 2 or len(sys.argv) > 4:
+        print("Usage:\n  {0} <WN_XML_file> [<threads> [<rounds>]]".format(sys.argv[0]), file=sys.stderr)
+        sys.exit(1)
+    nthreads = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    rounds = int(sys.argv[3]) if len(sys.argv) > 3 else 3
+
+    print("Reading XML...", file=sys.stderr)
+    ref = WNQuery.WNQuery(sys.argv[1], open(os.devnull, "w"))
+    wn = WNQuery.WNQuery(sys.argv[1], open(os.devnull, "w"))
+    wn.expandCacheSize = EXPAND_CACHE_SIZE
+
+    # single threaded reference run on a separate instance
+    queries = make_queries(ref)
+    expected = [func(ref) for _, func in queries]
+
+    errors = run(wn, queries, expected, nthreads, rounds, "unfrozen")
+    wn.freeze()
+    errors += run(wn, queries, expected, nthreads, rounds, "frozen")
+    if errors:
+        print("FAILED: {0} wrong results".format(len(errors)))
+        sys.exit(1)
+    print("OK")
+
+if __name__ == '__main__':
+    main()